@@ -0,0 +1,15 @@
+"""Benchmarks for the Starlink integration, run against a fake dish.
+
+Run from the repository root, in an environment with Home Assistant and
+starlink-grpc-core installed:
+
+    python -m benchmarks
+    python -m benchmarks --latency 0.05 --failure-rate 0.1 get coordinator
+    python -m benchmarks --save baseline.json
+    python -m benchmarks --baseline baseline.json
+
+To replay a real dish, record it first (see --help for the options):
+
+    python -m benchmarks --record dish.json --target 192.168.100.1:9200
+    python -m benchmarks --replay dish.json
+"""
@@ -0,0 +1,105 @@
+"""Command line entry point; see the package docstring for usage."""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+
+from custom_components.starlink.const import DEFAULT_TARGET, HISTORY_SCAN_INTERVAL
+from custom_components.starlink.loader import async_import_stack
+
+from .fake_dish import FakeDish, record
+from .suites import HIGHER_IS_BETTER, SUITES
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Benchmark the Starlink integration.")
+    parser.add_argument("suites", nargs="*", metavar="suite",
+                        help="Benchmarks to run, any of: " + ", ".join(SUITES) + "; default all")
+    parser.add_argument("--polls", type=int, default=200, help="Timed polls per benchmark")
+    parser.add_argument("--alloc-polls", type=int, default=20,
+                        help="Polls per benchmark traced for allocations")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Seconds the fake dish takes to answer each call")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="Up to this many more seconds, at random, per call")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="Fraction of calls the fake dish fails")
+    parser.add_argument("--samples-per-poll", type=int, default=HISTORY_SCAN_INTERVAL,
+                        help="New history samples the fake dish has on each history poll")
+    parser.add_argument("--replay", metavar="FILE", help="Replay a recording instead of "
+                        "synthetic data")
+    parser.add_argument("--record", metavar="FILE",
+                        help="Record the dish at --target to FILE, then exit")
+    parser.add_argument("--target", default=DEFAULT_TARGET, help="Dish to record")
+    parser.add_argument("--save", metavar="FILE", help="Write the results to FILE as JSON")
+    parser.add_argument("--baseline", metavar="FILE",
+                        help="Compare with results saved by --save, and exit with status 1 "
+                        "if any metric is more than --tolerance worse")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed fraction of regression against --baseline")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="Show the integration's log, including injected failures")
+    opts = parser.parse_args()
+    unknown = set(opts.suites).difference(SUITES)
+    if unknown:
+        parser.error("unknown suite: " + ", ".join(sorted(unknown)))
+    return opts
+
+
+def regressions(results, baseline, tolerance):
+    """Return a line for every metric worse than baseline by more than tolerance."""
+    lines = []
+    for suite, metrics in results.items():
+        for metric, value in metrics.items():
+            before = baseline.get(suite, {}).get(metric)
+            if not before or metric in ("failed_polls", "entities"):
+                continue
+            change = (before - value if metric in HIGHER_IS_BETTER else value - before) / before
+            if change > tolerance:
+                lines.append(f"{suite}.{metric}: {before:.4g} -> {value:.4g} ({change:+.0%})")
+    return lines
+
+
+async def run(opts):
+    await async_import_stack()
+    kwargs = {
+        "latency": opts.latency,
+        "jitter": opts.jitter,
+        "failure_rate": opts.failure_rate,
+        "samples_per_poll": opts.samples_per_poll,
+    }
+    results = {}
+    for name in opts.suites or SUITES:
+        dish = FakeDish.from_file(opts.replay, **kwargs) if opts.replay else FakeDish(**kwargs)
+        with dish:
+            results[name] = await SUITES[name](dish, opts.polls, opts.alloc_polls)
+        print(name)
+        for metric, value in results[name].items():
+            print(f"  {metric:26} {value:12.4g}")
+    return results
+
+
+def main():
+    opts = parse_args()
+    logging.basicConfig(level=logging.DEBUG if opts.verbose else logging.CRITICAL)
+    if opts.record:
+        record(opts.target, opts.record)
+        return 0
+
+    results = asyncio.run(run(opts))
+    if opts.save:
+        with open(opts.save, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    if opts.baseline:
+        with open(opts.baseline, encoding="utf-8") as file:
+            worse = regressions(results, json.load(file), opts.tolerance)
+        for line in worse:
+            print("REGRESSION " + line)
+        return 1 if worse else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
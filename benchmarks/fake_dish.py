@@ -0,0 +1,187 @@
+"""Stand-in for a Starlink dish, replaying recorded responses."""
+import json
+import math
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import grpc
+import starlink_grpc
+
+# starlink_grpc functions the integration calls, which FakeDish replaces.
+PATCHED = ("status_data", "location_data", "get_history", "get_id", "reboot", "set_stow_state")
+HISTORY_SAMPLES = 900
+
+
+def synthetic_recording(seed: int = 0, polls: int = 10) -> dict:
+    """Build a recording shaped like a real dish's, with random values."""
+    rnd = random.Random(seed)
+
+    def status():
+        return [
+            {
+                "id": "ut-benchmark", "hardware_version": "rev3_proto2",
+                "software_version": "benchmark", "state": "CONNECTED",
+                "uptime": rnd.randrange(10**6), "snr": None,
+                "seconds_to_first_nonempty_slot": 0.0,
+                "pop_ping_drop_rate": rnd.choice((0.0, 0.0, 0.0, 0.05)),
+                "downlink_throughput_bps": rnd.uniform(0, 2e8),
+                "uplink_throughput_bps": rnd.uniform(0, 2e7),
+                "pop_ping_latency_ms": rnd.uniform(20, 60),
+                "alerts": 0, "fraction_obstructed": rnd.uniform(0, 0.01),
+                "currently_obstructed": False, "seconds_obstructed": None,
+                "obstruction_duration": None, "obstruction_interval": None,
+                "direction_azimuth": 10.0, "direction_elevation": 60.0,
+                "is_snr_above_noise_floor": True,
+            },
+            {
+                "wedges_fraction_obstructed[]": [rnd.uniform(0, 0.1) for _ in range(12)],
+                "raw_wedges_fraction_obstructed[]": [rnd.uniform(0, 0.1) for _ in range(12)],
+                "valid_s": 3600.0,
+            },
+            {
+                f"alert_{name}": False for name in (
+                    "motors_stuck", "thermal_throttle", "thermal_shutdown",
+                    "mast_not_near_vertical", "unexpected_location",
+                    "slow_ethernet_speeds", "roaming", "install_pending", "is_heating")
+            },
+        ]
+
+    drops = [1.0 if rnd.random() < 0.02 else 0.0 for _ in range(HISTORY_SAMPLES)]
+    return {
+        "id": "ut-benchmark",
+        "status": [status() for _ in range(polls)],
+        "location": {"latitude": 1.5, "longitude": 2.5, "altitude": 3.5},
+        "history": {
+            "current": HISTORY_SAMPLES,
+            "pop_ping_drop_rate": drops,
+            "pop_ping_latency_ms": [
+                math.nan if drop else rnd.uniform(20, 60) for drop in drops],
+            "downlink_throughput_bps": [rnd.uniform(0, 2e8) for _ in drops],
+            "uplink_throughput_bps": [rnd.uniform(0, 2e7) for _ in drops],
+            "power_in": [rnd.uniform(40, 80) for _ in drops],
+        },
+    }
+
+
+def record(target: str, path: str, polls: int = 10):
+    """Record responses from the dish at target into a JSON file for FakeDish."""
+    context = starlink_grpc.ChannelContext(target=target)
+    try:
+        status = []
+        for _ in range(polls):
+            status.append(list(starlink_grpc.status_data(context=context)))
+            time.sleep(1)
+        history = starlink_grpc.get_history(context=context)
+        recording = {
+            "id": starlink_grpc.get_id(context=context),
+            "status": status,
+            "location": starlink_grpc.location_data(context=context),
+            "history": {"current": history.current} | {
+                field: list(getattr(history, field)) for field in starlink_grpc.HISTORY_FIELDS},
+        }
+    finally:
+        context.close()
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(recording, file)
+
+
+class FakeDish:
+    """Answer starlink_grpc calls from a recording, as slowly or badly as asked.
+
+    While installed, the starlink_grpc functions the integration uses are
+    replaced, so StarlinkClass, the coordinators and DishCommon run their
+    real code paths against it. Status responses cycle through the recorded
+    polls. The history buffer is the recorded one, with its sample counter
+    advanced by samples_per_poll on every get_history call, so each poll
+    sees that many new samples.
+
+    Every call first sleeps latency seconds, plus up to jitter more, then
+    fails with probability failure_rate the way the real call would.
+    """
+
+    def __init__(self, recording: dict = None, latency: float = 0.0, jitter: float = 0.0,
+                 failure_rate: float = 0.0, samples_per_poll: int = 1, seed: int = 0):
+        self.recording = recording or synthetic_recording(seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.samples_per_poll = samples_per_poll
+        self.calls = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._poll = 0
+        self._current = self.recording["history"]["current"]
+        self._saved = {}
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "FakeDish":
+        """Replay the recording saved by record at path."""
+        with open(path, encoding="utf-8") as file:
+            return cls(json.load(file), **kwargs)
+
+    def install(self):
+        """Replace the starlink_grpc functions with this dish's."""
+        for name in PATCHED:
+            self._saved[name] = getattr(starlink_grpc, name)
+            setattr(starlink_grpc, name, getattr(self, name))
+
+    def uninstall(self):
+        """Put the real starlink_grpc functions back."""
+        for name, function in self._saved.items():
+            setattr(starlink_grpc, name, function)
+        self._saved.clear()
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.uninstall()
+
+    def _respond(self, rpc_error: bool = False):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            failed = self._random.random() < self.failure_rate
+            if failed:
+                self.failures += 1
+        if delay:
+            time.sleep(delay)
+        if failed:
+            if rpc_error:
+                raise grpc.RpcError("injected failure")
+            raise starlink_grpc.GrpcError("injected failure")
+
+    def status_data(self, context=None):
+        self._respond()
+        with self._lock:
+            groups = self.recording["status"][self._poll % len(self.recording["status"])]
+            self._poll += 1
+        return tuple(dict(group) for group in groups)
+
+    def location_data(self, context=None):
+        self._respond()
+        return dict(self.recording["location"])
+
+    def get_history(self, context=None):
+        # Like the real one, get_history passes raw RPC errors through.
+        self._respond(rpc_error=True)
+        with self._lock:
+            self._current += self.samples_per_poll
+            current = self._current
+        return SimpleNamespace(current=current, **{
+            field: values for field, values in self.recording["history"].items()
+            if field != "current"})
+
+    def get_id(self, context=None):
+        self._respond()
+        return self.recording["id"]
+
+    def reboot(self, context=None):
+        self._respond()
+
+    def set_stow_state(self, unstow=False, context=None):
+        self._respond()
@@ -0,0 +1,273 @@
+"""The benchmarks, each run against a FakeDish."""
+import asyncio
+from contextlib import asynccontextmanager
+import tempfile
+import time
+import tracemalloc
+from typing import Awaitable, Callable, Dict, List
+
+import numpy as np
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.starlink import StarlinkClass, StarlinkUpdateCoordinator
+from custom_components.starlink.binary_sensor import BINARY_SENSORS
+from custom_components.starlink.entity import dynamic_descriptions, make_accessor
+from custom_components.starlink.history import StarlinkHistory
+from custom_components.starlink.sensor import ROLLUP_SENSORS, SENSORS, STREAM_SENSORS
+from custom_components.starlink.streaming import StreamingStats
+
+from .fake_dish import FakeDish
+
+# Metrics where a higher value is better; for all others lower is better.
+HIGHER_IS_BETTER = frozenset(("samples_per_s", "refreshes"))
+# How long the scheduled benchmark lets the coordinator poll on its own.
+SCHEDULED_SECONDS = 10
+
+
+class LoopMonitor:
+    """Measure how long the event loop is kept from running other tasks.
+
+    A task wakes every interval seconds; any lateness beyond that is time
+    the loop spent blocked in some callback.
+    """
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.blocked = 0.0
+        self.longest = 0.0
+        self._task = None
+
+    async def _watch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            # Sleeps overshoot by a little even on an idle loop.
+            late = loop.time() - start - self.interval
+            if late > self.interval:
+                self.blocked += late
+                self.longest = max(self.longest, late)
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._watch())
+        return self
+
+    def __exit__(self, *exc_info):
+        self._task.cancel()
+
+
+def _latency_metrics(durations: List[float]) -> Dict[str, float]:
+    durations = np.asarray(durations) * 1000
+    return {
+        "p50_ms": float(np.percentile(durations, 50)),
+        "p99_ms": float(np.percentile(durations, 99)),
+    }
+
+
+async def _measure(poll: Callable[[], Awaitable], polls: int,
+                   alloc_polls: int) -> Dict[str, float]:
+    """Time polls calls to poll, then trace the allocations of a few more.
+
+    Failed polls are counted and timed like any other.
+    """
+    durations = []
+    failed = 0
+    with LoopMonitor() as monitor:
+        for _ in range(polls):
+            start = time.perf_counter()
+            try:
+                await poll()
+            except ConnectionError:
+                failed += 1
+            durations.append(time.perf_counter() - start)
+            # Let the monitor in even when poll never waited on anything.
+            await asyncio.sleep(0)
+    metrics = _latency_metrics(durations)
+    metrics["loop_blocked_ms_per_poll"] = monitor.blocked * 1000 / polls
+    metrics["loop_blocked_max_ms"] = monitor.longest * 1000
+    metrics["failed_polls"] = failed
+
+    # Tracing slows everything down, so it gets its own polls.
+    allocated = []
+    tracemalloc.start()
+    try:
+        for _ in range(alloc_polls):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            try:
+                await poll()
+            except ConnectionError:
+                pass
+            allocated.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    metrics["alloc_kib_per_poll"] = float(np.mean(allocated)) / 1024 if allocated else 0.0
+    return metrics
+
+
+@asynccontextmanager
+async def _running_hass():
+    """Yield a started HomeAssistant with a temporary config dir."""
+    with tempfile.TemporaryDirectory() as config_dir:
+        try:
+            hass = HomeAssistant(config_dir)
+        except TypeError:
+            # Before HA 2024.2 the config dir was set after construction.
+            hass = HomeAssistant()
+            hass.config.config_dir = config_dir
+        await hass.async_start()
+        try:
+            yield hass
+        finally:
+            await hass.async_stop(force=True)
+
+
+async def _warm_up(poll: Callable[[], Awaitable]):
+    try:
+        await poll()
+    except ConnectionError:
+        pass
+
+
+async def bench_get(dish: FakeDish, polls: int, alloc_polls: int) -> Dict[str, float]:
+    """StarlinkClass.get(), as the fast coordinator calls it."""
+    api = StarlinkClass()
+    try:
+        return await _measure(lambda: api.get(location=False), polls, alloc_polls)
+    finally:
+        await api.async_shutdown()
+
+
+async def bench_coordinator(dish: FakeDish, polls: int, alloc_polls: int) -> Dict[str, float]:
+    """A refresh of the fast StarlinkUpdateCoordinator, rolling statistics included."""
+    async with _running_hass() as hass:
+        api = StarlinkClass()
+        coordinator = StarlinkUpdateCoordinator(
+            hass, api=api, name="Starlink benchmark", polling_interval=1,
+            location=False, statistics=StreamingStats())
+
+        async def refresh():
+            await coordinator.async_refresh()
+            if not coordinator.last_update_success:
+                raise ConnectionError("Refresh failed")
+
+        try:
+            return await _measure(refresh, polls, alloc_polls)
+        finally:
+            await api.async_shutdown()
+
+
+async def bench_scheduled(dish: FakeDish, polls: int, alloc_polls: int) -> Dict[str, float]:
+    """The fast StarlinkUpdateCoordinator refreshing on its own one second schedule.
+
+    Nothing calls async_refresh; a listener starts the coordinator's own
+    schedule, as an entity would, and it runs for SCHEDULED_SECONDS. A
+    schedule that never fires shows up as zero refreshes. polls and
+    alloc_polls are not used.
+    """
+    async with _running_hass() as hass:
+        api = StarlinkClass()
+        coordinator = StarlinkUpdateCoordinator(
+            hass, api=api, name="Starlink benchmark", polling_interval=1,
+            location=False, statistics=StreamingStats())
+        loop = asyncio.get_running_loop()
+        starts = []
+        failed = 0
+        update = coordinator._async_update_data
+
+        async def timed_update():
+            nonlocal failed
+            starts.append(loop.time())
+            try:
+                return await update()
+            except Exception:
+                failed += 1
+                raise
+
+        coordinator._async_update_data = timed_update
+        calls = dish.calls
+        try:
+            remove_listener = coordinator.async_add_listener(lambda: None)
+            await asyncio.sleep(SCHEDULED_SECONDS)
+            remove_listener()
+        finally:
+            await api.async_shutdown()
+
+    refreshes = len(starts)
+    # How far each refresh started from one second after the one before.
+    drift = np.abs(np.diff(starts) - 1) * 1000 if refreshes > 1 else np.zeros(1)
+    return {
+        "refreshes": refreshes,
+        "interval_drift_p50_ms": float(np.percentile(drift, 50)),
+        "interval_drift_max_ms": float(drift.max()),
+        "dish_calls_per_refresh": (dish.calls - calls) / refreshes if refreshes else 0.0,
+        "failed_polls": failed,
+    }
+
+
+async def bench_entities(dish: FakeDish, polls: int, alloc_polls: int) -> Dict[str, float]:
+    """Computing the value of every sensor and binary sensor from one payload."""
+    api = StarlinkClass()
+    try:
+        payload = await api.get()
+    finally:
+        await api.async_shutdown()
+    payload.update(StreamingStats().update(payload, 0.0))
+    descriptions = SENSORS + ROLLUP_SENSORS + STREAM_SENSORS + BINARY_SENSORS
+    seen = {description.key for description in descriptions}
+    descriptions += tuple(dynamic_descriptions(payload, set(seen), binary=False))
+    descriptions += tuple(dynamic_descriptions(payload, set(seen), binary=True))
+    accessors = [make_accessor(description) for description in descriptions]
+
+    async def compute():
+        for accessor in accessors:
+            accessor(payload)
+
+    metrics = await _measure(compute, polls, alloc_polls)
+    metrics["entities"] = len(accessors)
+    return metrics
+
+
+async def bench_history(dish: FakeDish, polls: int, alloc_polls: int) -> Dict[str, float]:
+    """StarlinkHistory.fetch: bulk history, rollups and history stats."""
+    history = StarlinkHistory()
+
+    async def fetch():
+        await asyncio.get_running_loop().run_in_executor(None, history.fetch, None)
+
+    # The first fetch parses the whole buffer; later ones only new samples.
+    await _warm_up(fetch)
+    metrics = await _measure(fetch, polls, alloc_polls)
+    metrics["samples_per_s"] = dish.samples_per_poll / (metrics["p50_ms"] / 1000)
+    return metrics
+
+
+async def bench_bulk(dish: FakeDish, polls: int, alloc_polls: int) -> Dict[str, float]:
+    """DishCommon.get_bulk_data alone, feeding a no-op add_bulk."""
+    history = StarlinkHistory()
+
+    def add_bulk(bulk, samples, timestamp, counter):
+        pass
+
+    def fetch_bulk():
+        if history.get_bulk_data(history.opts, history.gstate, add_bulk):
+            raise ConnectionError("Failure getting history")
+
+    async def fetch():
+        await asyncio.get_running_loop().run_in_executor(None, fetch_bulk)
+
+    await _warm_up(fetch)
+    metrics = await _measure(fetch, polls, alloc_polls)
+    metrics["samples_per_s"] = dish.samples_per_poll / (metrics["p50_ms"] / 1000)
+    return metrics
+
+
+SUITES = {
+    "get": bench_get,
+    "coordinator": bench_coordinator,
+    "scheduled": bench_scheduled,
+    "entities": bench_entities,
+    "history": bench_history,
+    "bulk": bench_bulk,
+}
@@ -1,16 +1,51 @@
 """The Starlink integration."""
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+from functools import partial
 import logging
+import random
+import shutil
 #from starlinkpypi import Starlink
 import voluptuous as vol
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+from homeassistant.helpers.storage import STORAGE_DIR
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
-from homeassistant.const import Platform
-from .const import COORDINATOR, DOMAIN, SPACEX_API
+from homeassistant.const import CONF_HOST, CONF_SCAN_INTERVAL, Platform
+from .breaker import BusyError, CircuitBreaker, CircuitOpenError
+from .channel import ChannelPool, StarlinkChannel
+from .const import (
+    ADAPTIVE_BACKOFF,
+    ADAPTIVE_JITTER,
+    ADAPTIVE_THROUGHPUT_DELTA,
+    CHANNEL_POOL,
+    CONF_ADAPTIVE_POLLING,
+    CONF_MAX_SCAN_INTERVAL,
+    COORDINATOR,
+    COORDINATOR_HISTORY,
+    COORDINATOR_SLOW,
+    DEFAULT_ADAPTIVE_POLLING,
+    DEFAULT_MAX_SCAN_INTERVAL,
+    DEFAULT_SCAN_INTERVAL,
+    DEFAULT_TARGET,
+    DOMAIN,
+    EXECUTOR_WORKERS,
+    HISTORY_SCAN_INTERVAL,
+    HISTORY_TIMEOUT,
+    REQUEST_TIMEOUT,
+    SCHEDULER,
+    SLOW_SCAN_INTERVAL,
+    SPACEX_API,
+    TRANSITION_KEYS,
+)
+from .loader import async_import_stack
+from .scheduler import PollScheduler, ScheduledCoordinator
+from .services import async_setup_services
+from .streaming import StreamingStats
 
 CONFIG_SCHEMA = vol.Schema({DOMAIN: vol.Schema({})}, extra=vol.ALLOW_EXTRA)
 _LOGGER = logging.getLogger(__name__)
@@ -21,40 +56,75 @@ PLATFORMS = [Platform.BINARY_SENSOR, Platform.BUTTON, Platform.SENSOR]
 async def async_setup(hass: HomeAssistant, config: dict):
     """Set up the Starlink component."""
     hass.data.setdefault(DOMAIN, {})
+    async_setup_services(hass)
 
     return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Set up Starlink from a config entry."""
-    polling_interval = 1
-    api = StarlinkClass()
+    # Import grpc and starlink_grpc in the executor now, so that neither
+    # this setup nor the first poll blocks the event loop on it.
+    await async_import_stack()
+    polling_interval = entry.options.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
+    target = entry.data[CONF_HOST]
+    pool = hass.data[DOMAIN].setdefault(CHANNEL_POOL, ChannelPool())
+    scheduler = hass.data[DOMAIN].setdefault(SCHEDULER, PollScheduler())
+    api = StarlinkClass(
+        pool.acquire(target),
+        history_path=hass.config.path(STORAGE_DIR, DOMAIN, entry.entry_id),
+    )
 
-    try:
-        await api.get()
-    except ConnectionError as error:
-        _LOGGER.debug("Starlink API Error: %s", error)
-        return False
-        raise ConfigEntryNotReady from error
-    except ValueError as error:
-        _LOGGER.debug("Starlink API Error: %s", error)
-        return False
-        raise ConfigEntryNotReady from error
+    if entry.unique_id is None:
+        # Entities are keyed by dish id, so an entry from before entries
+        # had one must learn it before any entity is set up.
+        try:
+            dish_id = await api.get_id()
+        except ConnectionError as error:
+            await api.async_shutdown()
+            pool.release(target)
+            raise ConfigEntryNotReady(f"Dish at {target} is unreachable: {error}") from error
+        await _async_migrate_unique_ids(hass, entry, dish_id)
 
+    slow_coordinator = StarlinkUpdateCoordinator(
+        hass,
+        api=api,
+        name="Starlink (location and version)",
+        polling_interval=SLOW_SCAN_INTERVAL,
+        scheduler=scheduler,
+    )
     coordinator = StarlinkUpdateCoordinator(
         hass,
         api=api,
         name="Starlink",
         polling_interval=polling_interval,
+        max_polling_interval=entry.options.get(
+            CONF_MAX_SCAN_INTERVAL, DEFAULT_MAX_SCAN_INTERVAL),
+        adaptive=entry.options.get(
+            CONF_ADAPTIVE_POLLING, DEFAULT_ADAPTIVE_POLLING),
+        location=False,
+        on_transition=slow_coordinator,
+        statistics=StreamingStats(),
+        scheduler=scheduler,
     )
 
-    await coordinator.async_refresh()
+    history_coordinator = StarlinkHistoryCoordinator(
+        hass,
+        api=api,
+        name="Starlink history",
+        polling_interval=HISTORY_SCAN_INTERVAL,
+        scheduler=scheduler,
+    )
 
-    if not coordinator.last_update_success:
-        raise ConfigEntryNotReady
+    for polling_coordinator in (coordinator, slow_coordinator, history_coordinator):
+        entry.async_on_unload(scheduler.async_register(polling_coordinator))
 
     hass.data[DOMAIN][entry.entry_id] = {
-        COORDINATOR: coordinator, SPACEX_API: api}
+        COORDINATOR: coordinator,
+        COORDINATOR_SLOW: slow_coordinator,
+        COORDINATOR_HISTORY: history_coordinator,
+        SPACEX_API: api,
+    }
 
     for component in PLATFORMS:
         _LOGGER.info("Setting up platform: %s", component)
@@ -62,9 +132,69 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
             hass.config_entries.async_forward_entry_setup(entry, component)
         )
 
+    entry.async_on_unload(entry.add_update_listener(async_update_options))
+
+    # Entities start out unavailable and come up with the first refresh,
+    # which runs in the background so a slow or offline dish never holds
+    # up HA startup. Until it answers, the coordinators keep retrying on
+    # their own schedule.
+    entry.async_create_background_task(
+        hass,
+        _async_first_refresh(scheduler, coordinator, slow_coordinator, history_coordinator),
+        f"Starlink first refresh {target}",
+    )
+
     return True
 
 
+async def _async_first_refresh(scheduler: PollScheduler, *coordinators: DataUpdateCoordinator):
+    """Refresh every polling tier of a dish, each in its scheduler slot."""
+    await asyncio.gather(*(
+        scheduler.async_first_refresh(coordinator) for coordinator in coordinators))
+
+
+async def async_migrate_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Migrate an entry from before dish targets were configurable."""
+    if entry.version == 1:
+        data = {**entry.data, CONF_HOST: DEFAULT_TARGET}
+        try:
+            hass.config_entries.async_update_entry(entry, data=data, version=2)
+        except TypeError:
+            # Before HA 2024.1 the version could not be passed here.
+            entry.version = 2
+            hass.config_entries.async_update_entry(entry, data=data)
+        _LOGGER.debug("Migrated config entry to version %s", entry.version)
+    return True
+
+
+async def _async_migrate_unique_ids(hass: HomeAssistant, entry: ConfigEntry, dish_id: str):
+    """Key an entry from a single-dish install, and its entities, by dish id.
+
+    Those entities had unique IDs of the form starlink_<kind> and belonged
+    to the fixed starlinkstats and starlinkalert devices.
+    """
+    hass.config_entries.async_update_entry(entry, unique_id=dish_id)
+
+    @callback
+    def _migrate_entity(entity_entry: er.RegistryEntry):
+        if entity_entry.unique_id.startswith("starlink_"):
+            return {"new_unique_id": f"{dish_id}_{entity_entry.unique_id[len('starlink_'):]}"}
+        return None
+
+    await er.async_migrate_entries(hass, entry.entry_id, _migrate_entity)
+
+    device_registry = dr.async_get(hass)
+    for old, new in (("starlinkstats", f"{dish_id}_stats"), ("starlinkalert", f"{dish_id}_alerts")):
+        device = device_registry.async_get_device({(DOMAIN, old)})
+        if device is not None:
+            device_registry.async_update_device(device.id, new_identifiers={(DOMAIN, new)})
+
+
+async def async_update_options(hass: HomeAssistant, entry: ConfigEntry):
+    """Reload the entry so changed options take effect."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Unload a config entry."""
     unload_ok = all(
@@ -77,12 +207,29 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
         )
     )
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        entry_data = hass.data[DOMAIN].pop(entry.entry_id)
+        await entry_data[SPACEX_API].async_shutdown()
+        await hass.async_add_executor_job(
+            hass.data[DOMAIN][CHANNEL_POOL].release, entry.data[CONF_HOST])
 
     return unload_ok
 
 
-class StarlinkUpdateCoordinator(DataUpdateCoordinator):
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Delete the stored history of a removed entry."""
+    await hass.async_add_executor_job(
+        partial(shutil.rmtree, hass.config.path(STORAGE_DIR, DOMAIN, entry.entry_id),
+                ignore_errors=True))
+
+
+_UNSET = object()
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class StarlinkUpdateCoordinator(ScheduledCoordinator):
     """Class to manage fetching update data from the Starlink endpoint."""
 
     def __init__(
@@ -91,9 +238,27 @@ class StarlinkUpdateCoordinator(DataUpdateCoordinator):
         api: str,
         name: str,
         polling_interval: int,
+        max_polling_interval: int = None,
+        adaptive: bool = False,
+        location: bool = True,
+        on_transition: DataUpdateCoordinator = None,
+        statistics: StreamingStats = None,
+        scheduler: PollScheduler = None,
     ):
         """Initialize the global Starlink data updater."""
         self.api = api
+        self.scheduler = scheduler
+        self._location = location
+        self._on_transition = on_transition
+        self._statistics = statistics
+        self._min_interval = polling_interval
+        self._max_interval = max(max_polling_interval or polling_interval, polling_interval)
+        self._adaptive = adaptive
+        self._interval = polling_interval
+        self._changed_keys = set()
+        self._key_listeners = {}
+        self._notified_success = True
+        self._remove_dispatch = None
 
         super().__init__(
             hass=hass,
@@ -105,16 +270,113 @@ class StarlinkUpdateCoordinator(DataUpdateCoordinator):
     async def _async_update_data(self):
         """Fetch data from Starlink."""
         try:
+            await self.api.breaker.async_check()
             _LOGGER.debug("Updating the coordinator data.")
-            starlink_data = await self.api.get()
-
-            return starlink_data
+            starlink_data = await self.api.get(location=self._location)
+        except CircuitOpenError as error:
+            _LOGGER.debug("Starlink API: %s", error)
+            self._schedule_next(busy=False)
+            raise UpdateFailed(str(error)) from error
         except ConnectionError as error:
             _LOGGER.info("Starlink API: %s", error)
+            self.api.breaker.record_failure()
+            self._schedule_next(busy=False)
             raise UpdateFailed from error
         except ValueError as error:
             _LOGGER.info("Starlink API: %s", error)
+            self.api.breaker.record_failure()
+            self._schedule_next(busy=False)
             raise UpdateFailed from error
+        self.api.breaker.record_success()
+
+        if self._statistics is not None:
+            starlink_data.update(self._statistics.update(starlink_data, self.hass.loop.time()))
+        self._schedule_next(busy=self._is_busy(self.data, starlink_data))
+        if self._on_transition is not None and self.data and any(
+                self.data.get(key) != starlink_data.get(key) for key in TRANSITION_KEYS):
+            self.hass.async_create_task(self._on_transition.async_request_refresh())
+        old = self.data or {}
+        self._changed_keys = {
+            key for key, value in starlink_data.items() if old.get(key, _UNSET) != value}
+        return starlink_data
+
+    @callback
+    def async_add_key_listener(
+        self, key: str, update_callback: CALLBACK_TYPE, deadband: float = 0
+    ) -> CALLBACK_TYPE:
+        """Call update_callback when the value of key changes.
+
+        Numeric changes no larger than deadband from the value last reported
+        to this listener are ignored. Returns a function that removes the
+        listener.
+        """
+        last = self.data.get(key, _UNSET) if self.data else _UNSET
+        listener = [update_callback, deadband, last]
+        self._key_listeners.setdefault(key, []).append(listener)
+        if self._remove_dispatch is None:
+            self._remove_dispatch = self.async_add_listener(self._async_dispatch)
+
+        @callback
+        def remove_listener():
+            listeners = self._key_listeners[key]
+            listeners.remove(listener)
+            if not listeners:
+                del self._key_listeners[key]
+            if not self._key_listeners and self._remove_dispatch is not None:
+                self._remove_dispatch()
+                self._remove_dispatch = None
+
+        return remove_listener
+
+    @callback
+    def _async_dispatch(self):
+        """Notify the key listeners affected by the last refresh."""
+        flipped = self.last_update_success != self._notified_success
+        if flipped:
+            self._notified_success = self.last_update_success
+            keys = list(self._key_listeners)
+        elif self.last_update_success:
+            keys = self._changed_keys.intersection(self._key_listeners)
+        else:
+            return
+        data = self.data or {}
+        for key in keys:
+            value = data.get(key, _UNSET)
+            for listener in self._key_listeners[key]:
+                update_callback, deadband, last = listener
+                # Availability changed either way: every listener must
+                # update, however little its value moved.
+                if (not flipped and deadband and _is_number(value)
+                        and _is_number(last) and abs(value - last) <= deadband):
+                    continue
+                listener[2] = value
+                update_callback()
+
+    @staticmethod
+    def _is_busy(old, new) -> bool:
+        """Return whether the link is active enough to keep polling fast."""
+        if new.get("alerts") or new.get("currently_obstructed"):
+            return True
+        if not old or old.get("state") != new.get("state"):
+            return True
+        absolute, relative = ADAPTIVE_THROUGHPUT_DELTA
+        for key in ("downlink_throughput_bps", "uplink_throughput_bps"):
+            before = old.get(key) or 0
+            after = new.get(key) or 0
+            if abs(after - before) > max(absolute, relative * before):
+                return True
+        return False
+
+    def _schedule_next(self, busy: bool):
+        """Pick the interval until the next refresh."""
+        if not self._adaptive:
+            return
+        if busy:
+            self._interval = self._min_interval
+        else:
+            self._interval = min(self._interval * ADAPTIVE_BACKOFF, self._max_interval)
+        jitter = random.uniform(1 - ADAPTIVE_JITTER, 1 + ADAPTIVE_JITTER)
+        self.update_interval = timedelta(seconds=self._interval * jitter)
 
     async def reboot_job(self):
         try:
@@ -141,39 +403,175 @@ class StarlinkUpdateCoordinator(DataUpdateCoordinator):
             raise UpdateFailed from error
 
 
-class StarlinkClass:
+class StarlinkHistoryCoordinator(ScheduledCoordinator):
+    """Class to manage fetching history statistics from the Starlink endpoint.
+
+    Each refresh covers the samples the dish recorded since the previous one.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api: str,
+        name: str,
+        polling_interval: int,
+        scheduler: PollScheduler = None,
+    ):
+        """Initialize the Starlink history updater."""
+        self.api = api
+        self.scheduler = scheduler
+
+        super().__init__(
+            hass=hass,
+            logger=_LOGGER,
+            name=name,
+            update_interval=timedelta(seconds=polling_interval),
+        )
 
-    def __init__(self):
-        pass
+    async def _async_update_data(self):
+        """Fetch history stats from Starlink."""
+        try:
+            await self.api.breaker.async_check()
+            stats = await self.api.get_history_stats()
+        except CircuitOpenError as error:
+            _LOGGER.debug("Starlink API: %s", error)
+            raise UpdateFailed(str(error)) from error
+        except BusyError as error:
+            _LOGGER.info("Starlink API: %s", error)
+            raise UpdateFailed(str(error)) from error
+        except ConnectionError as error:
+            _LOGGER.info("Starlink API: %s", error)
+            self.api.breaker.record_failure()
+            raise UpdateFailed from error
+        self.api.breaker.record_success()
+        return stats
+
+    @callback
+    def async_add_key_listener(
+        self, key: str, update_callback: CALLBACK_TYPE, deadband: float = 0
+    ) -> CALLBACK_TYPE:
+        """Call update_callback after every refresh; every stat is new each time."""
+        return self.async_add_listener(update_callback)
+
+
+class StarlinkClass:
+    """Async access to the dish."""
+
+    def __init__(self, context: StarlinkChannel = None, timeout: float = REQUEST_TIMEOUT,
+                 history_path: str = None):
+        self._owns_context = context is None
+        self._context = StarlinkChannel() if context is None else context
+        self._timeout = timeout
+        self._history_path = history_path
+        self._history = None
+        self.breaker = CircuitBreaker(self.get_id)
+        self._executor = ThreadPoolExecutor(
+            max_workers=EXECUTOR_WORKERS, thread_name_prefix="starlink_grpc")
+
+    async def _async_call(self, function, *args, deadline: float = None,
+                          timeout_error: type = ConnectionError, **kwargs):
+        """Run a blocking starlink_grpc function in the executor with a deadline.
+
+        Each RPC the function makes is ended by grpc after the api's timeout.
+        deadline, if longer, bounds the function as a whole; timeout_error is
+        raised if it passes.
+        """
+        stack = await async_import_stack()
+        deadline = self._timeout if deadline is None else deadline
+        future = asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            partial(function, *args, context=self._context.call(self._timeout), **kwargs))
+        try:
+            return await asyncio.wait_for(future, deadline)
+        except asyncio.TimeoutError as error:
+            # An RPC still running in the executor ends at its own grpc
+            # deadline; calls of the other tiers on the channel carry on.
+            raise timeout_error(
+                f"Dish call did not finish within {deadline}s") from error
+        except stack.starlink_grpc.GrpcError as error:
+            raise ConnectionError(str(error)) from error
+        except stack.grpc.RpcError as error:
+            # get_history passes raw RPC errors through
+            raise ConnectionError(str(stack.starlink_grpc.GrpcError(error))) from error
+
+    async def get(self, location: bool = True, history: bool = False):
+        """Fetch the coordinator payload from the dish.
+
+        Status, location and history (the last two if requested) are
+        independent RPCs, so they are issued together over the shared channel
+        and a poll takes as long as the slowest of them rather than their sum.
+        The raw history object, if fetched, is returned under the "history"
+        key.
+        """
+        starlink_grpc = (await async_import_stack()).starlink_grpc
+        calls = [self._async_call(starlink_grpc.status_data)]
+        if location:
+            calls.append(self._async_call(starlink_grpc.location_data))
+        if history:
+            calls.append(self._async_call(starlink_grpc.get_history))
+        status, *extra = await asyncio.gather(*calls)
 
-    async def get(self):
-        import starlink_grpc
-        status = starlink_grpc.status_data()
-        location = starlink_grpc.location_data()
         responseObj = {}
-        for line in status:
-            responseObj =responseObj | line
-        responseObj =responseObj | location
-        if responseObj["latitude"] is None or responseObj["latitude"] == '':
-            responseObj["latitude"] = 0
-        if responseObj["longitude"] is None or responseObj["longitude"] == '':
-            responseObj["longitude"] = 0
-        if responseObj["altitude"] is None or responseObj["altitude"] == '':
-            responseObj["altitude"] = 0
+        for group in status:
+            responseObj.update(group)
+        if location:
+            responseObj.update(extra.pop(0))
+            for key in ("latitude", "longitude", "altitude"):
+                if responseObj[key] is None or responseObj[key] == '':
+                    responseObj[key] = 0
+        if history:
+            responseObj["history"] = extra.pop(0)
 
         return responseObj
 
+    async def get_id(self) -> str:
+        """Fetch the dish's unique id."""
+        starlink_grpc = (await async_import_stack()).starlink_grpc
+        return await self._async_call(starlink_grpc.get_id)
+
+    async def _async_history(self):
+        if self._history is None:
+            history = (await async_import_stack()).history
+            self._history = history.StarlinkHistory(self._history_path)
+        return self._history
+
+    async def get_history_stats(self):
+        """Fetch ping, latency and usage stats for the samples since the last call."""
+        history = await self._async_history()
+        # Its RPC ends well within HISTORY_TIMEOUT, so a fetch still running
+        # then is busy computing the stats or storing the samples.
+        return await self._async_call(
+            history.fetch, deadline=HISTORY_TIMEOUT, timeout_error=BusyError)
+
+    async def get_stored_history(self, start: int, end: int):
+        """Read the stored samples from timestamp start up to end.
+
+        Returns the timestamps and columns from BulkHistoryStore.read, or
+        None if samples are not being stored.
+        """
+        store = (await self._async_history()).gstate.store
+        if store is None:
+            return None
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, store.read, start, end)
+
     async def reboot_job(self):
-        import starlink_grpc
-        starlink_grpc.reboot()
+        starlink_grpc = (await async_import_stack()).starlink_grpc
+        await self._async_call(starlink_grpc.reboot)
         return
 
     async def stow_job(self):
-        import starlink_grpc
-        starlink_grpc.set_stow_state(unstow=False)
+        starlink_grpc = (await async_import_stack()).starlink_grpc
+        await self._async_call(starlink_grpc.set_stow_state, unstow=False)
         return
 
     async def unstow_job(self):
-        import starlink_grpc
-        starlink_grpc.set_stow_state(unstow=True)
+        starlink_grpc = (await async_import_stack()).starlink_grpc
+        await self._async_call(starlink_grpc.set_stow_state, unstow=True)
         return
+
+    async def async_shutdown(self):
+        """Release the executor, and the channel if it is private."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._owns_context:
+            self._context.shutdown()
@@ -0,0 +1,133 @@
+"""Circuit breaker that stops polling a dish while it is unreachable."""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from homeassistant.core import CALLBACK_TYPE, callback
+
+from .const import (
+    BREAKER_MAX_PROBE_INTERVAL,
+    BREAKER_MIN_PROBE_INTERVAL,
+    BREAKER_THRESHOLD,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+BREAKER_STATES = [STATE_CLOSED, STATE_OPEN, STATE_HALF_OPEN]
+
+
+class CircuitOpenError(ConnectionError):
+    """The dish is not being called because the breaker is open."""
+
+
+class BusyError(ConnectionError):
+    """An earlier poll is still being processed locally; not the dish's fault."""
+
+
+class CircuitBreaker:
+    """Track consecutive failed polls of one dish and cut them off.
+
+    While closed, every poll goes through. After threshold consecutive
+    failures the breaker opens and polls fail at once with CircuitOpenError,
+    without touching the network. Once the probe interval has passed, the
+    next poll first runs probe, a cheap call such as get_id (half open). If
+    the dish answers the breaker closes and the poll goes ahead; otherwise
+    it stays open and the probe interval doubles, up to max_interval.
+
+    One breaker is shared by every polling tier of a dish, so only one
+    probe is in flight at a time.
+    """
+
+    def __init__(
+        self,
+        probe: Callable[[], Awaitable],
+        threshold: int = BREAKER_THRESHOLD,
+        min_interval: float = BREAKER_MIN_PROBE_INTERVAL,
+        max_interval: float = BREAKER_MAX_PROBE_INTERVAL,
+    ):
+        self._probe = probe
+        self.threshold = threshold
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.probe_interval = min_interval
+        self._next_probe: Optional[float] = None
+        self._listeners = []
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Call update_callback whenever the state or failure count changes."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener():
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    async def async_check(self):
+        """Return if a poll may call the dish, probing it first if due.
+
+        Raises:
+            CircuitOpenError: The breaker is open, or the probe failed.
+        """
+        if self.state == STATE_CLOSED:
+            return
+        if self.state == STATE_HALF_OPEN or time.monotonic() < self._next_probe:
+            raise CircuitOpenError(f"Dish unreachable, next probe in {self._seconds_to_probe():.0f}s")
+
+        self._set_state(STATE_HALF_OPEN)
+        try:
+            await self._probe()
+        except ConnectionError as error:
+            self.failures += 1
+            self.probe_interval = min(self.probe_interval * 2, self._max_interval)
+            self._open()
+            raise CircuitOpenError(f"Dish still unreachable: {error}") from error
+        except asyncio.CancelledError:
+            self._open()
+            raise
+        _LOGGER.info("Dish answered again, resuming polls")
+        self.record_success()
+
+    @callback
+    def record_success(self):
+        """Note a poll that reached the dish."""
+        if self.state == STATE_CLOSED and not self.failures:
+            return
+        self.failures = 0
+        self.probe_interval = self._min_interval
+        self.state = STATE_CLOSED
+        self._notify()
+
+    @callback
+    def record_failure(self):
+        """Note a poll that failed to reach the dish."""
+        self.failures += 1
+        if self.state == STATE_CLOSED and self.failures >= self.threshold:
+            _LOGGER.info("Dish failed %s polls in a row, probing it every %ss until it answers",
+                         self.failures, self.probe_interval)
+            self._open()
+        else:
+            self._notify()
+
+    def _seconds_to_probe(self) -> float:
+        return max(self._next_probe - time.monotonic(), 0) if self._next_probe else 0
+
+    def _open(self):
+        self._next_probe = time.monotonic() + self.probe_interval
+        self._set_state(STATE_OPEN)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            self.state = state
+            self._notify()
+
+    def _notify(self):
+        for update_callback in list(self._listeners):
+            update_callback()
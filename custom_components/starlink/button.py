@@ -27,7 +27,7 @@ async def async_setup_entry(hass, entry, async_add_entities):
             "Dish Reboot",
             "starlink_reboot",
             "mdi:restart",
-            "starlinkstats"))
+            entry.unique_id))
 
     buttons.append(
         StarlinkButton(
@@ -35,7 +35,7 @@ async def async_setup_entry(hass, entry, async_add_entities):
             "Dish Stow",
             "starlink_stow",
             "mdi:inbox-arrow-down-outline",
-            "starlinkstats"))
+            entry.unique_id))
 
     buttons.append(
         StarlinkButton(
@@ -43,7 +43,7 @@ async def async_setup_entry(hass, entry, async_add_entities):
             "Dish Unstow",
             "starlink_unstow",
             "mdi:satellite-uplink",
-            "starlinkstats"))
+            entry.unique_id))
 
     async_add_entities(buttons)
 
@@ -57,15 +57,15 @@ class StarlinkButton(ButtonEntity):
         name: str,
         entity_id: str,
         icon: str,
-        device_identifier: str,
+        dish_id: str,
     ):
         """Initialize Entities."""
         self._name = name
-        self._unique_id = f"starlink_{entity_id}"
+        self._unique_id = f"{dish_id}_{entity_id}"
         self._state = None
         self._icon = icon
         self._kind = entity_id
-        self._device_identifier = device_identifier
+        self._device_identifier = f"{dish_id}_stats"
         self.coordinator = coordinator
         self.attrs = {}
 
@@ -118,9 +118,3 @@ class StarlinkButton(ButtonEntity):
         elif self._kind == "starlink_unstow":
             await self.coordinator.unstow_job()
             _LOGGER.debug("Unstowing dish.")
-
-    async def async_added_to_hass(self):
-        """Subscribe to updates."""
-        self.async_on_remove(
-            self.coordinator.async_add_listener(self.async_write_ha_state)
-        )
@@ -0,0 +1,119 @@
+"""Long-lived gRPC channels to Starlink dishes."""
+import logging
+import threading
+import time
+from typing import Optional
+
+from .const import CHANNEL_OPTIONS, DEFAULT_TARGET
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class StarlinkChannel:
+    """A persistent channel to one dish, shared by all calls to it.
+
+    starlink_grpc.ChannelContext drops its channel whenever a call fails and
+    dials a new one on the next call. This class keeps a single channel for
+    its whole lifetime instead and lets grpc reconnect it in the background,
+    using the keepalive and reconnect backoff settings in CHANNEL_OPTIONS.
+
+    Each call goes through its own StarlinkCall, from call(), which is what
+    starlink_grpc gets as its context.
+    """
+
+    def __init__(self, target: str = DEFAULT_TARGET):
+        self.target = target
+        self.channel = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        """Return the channel, dialling it if it is not open."""
+        import grpc
+        with self._lock:
+            if self.channel is None:
+                _LOGGER.debug("Opening channel to %s", self.target)
+                self.channel = grpc.insecure_channel(
+                    self.target, options=CHANNEL_OPTIONS)
+            return self.channel
+
+    def call(self, timeout: Optional[float] = None) -> "StarlinkCall":
+        """Return a context for one starlink_grpc call over this channel.
+
+        If timeout is set, the RPCs of the call end after that many seconds.
+        """
+        return StarlinkCall(self, timeout)
+
+    def shutdown(self):
+        """Close the channel for good, ending any RPC in flight on it."""
+        with self._lock:
+            channel, self.channel = self.channel, None
+        if channel is not None:
+            channel.close()
+
+
+class StarlinkCall:
+    """The starlink_grpc context of a single call over a StarlinkChannel.
+
+    starlink_grpc retries a failed call once, on the channel from a second
+    get_channel, if the first get_channel reported the channel as reused.
+    That state lives here rather than on the shared channel, so concurrent
+    calls cannot use up or reset each other's retry.
+
+    With a timeout, every RPC of the call, retry included, is given a grpc
+    deadline that far from when the call was created. A call that overruns
+    is then ended by grpc on its own, without closing the channel under the
+    other calls using it.
+    """
+
+    def __init__(self, channel: StarlinkChannel, timeout: Optional[float] = None):
+        self.target = channel.target
+        self._channel = channel
+        self._retried = False
+        self._deadline = None if timeout is None else time.monotonic() + timeout
+
+    def get_channel(self):
+        """Return the channel and whether starlink_grpc may retry on it."""
+        channel = self._channel.open()
+        if self._deadline is not None:
+            from .deadline import with_deadline
+            channel = with_deadline(channel, self._deadline)
+        return channel, not self._retried
+
+    def close(self):
+        """Handle a failed call.
+
+        starlink_grpc calls this before its single retry. The channel is kept,
+        so the retry goes through grpc's own reconnect logic instead of a new
+        handshake, and is reported as not reused so a second failure is raised.
+        """
+        self._retried = True
+
+
+class ChannelPool:
+    """Channels shared across config entries, one per dish target."""
+
+    def __init__(self):
+        self._channels = {}
+        self._users = {}
+
+    def acquire(self, target: str = DEFAULT_TARGET) -> StarlinkChannel:
+        """Return the channel for target, creating it on first use."""
+        if target not in self._channels:
+            self._channels[target] = StarlinkChannel(target)
+            self._users[target] = 0
+        self._users[target] += 1
+        return self._channels[target]
+
+    def release(self, target: str = DEFAULT_TARGET):
+        """Drop one user of target and close its channel after the last one."""
+        self._users[target] -= 1
+        if self._users[target] <= 0:
+            del self._users[target]
+            self._channels.pop(target).shutdown()
+
+    def shutdown(self):
+        """Close every channel in the pool."""
+        for channel in self._channels.values():
+            channel.shutdown()
+        self._channels.clear()
+        self._users.clear()
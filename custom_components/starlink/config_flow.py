@@ -1,22 +1,142 @@
 """Config flow for Starlink Statistics and Alerts."""
 #from starlinkpypi import Starlink
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
 
-from homeassistant.helpers import config_entry_flow
+import voluptuous as vol
 
-from .const import DOMAIN
+from homeassistant import config_entries
+from homeassistant.const import CONF_HOST, CONF_SCAN_INTERVAL
+from homeassistant.core import callback
+
+from .const import (
+    CONF_ADAPTIVE_POLLING,
+    CONF_MAX_SCAN_INTERVAL,
+    DEFAULT_ADAPTIVE_POLLING,
+    DEFAULT_MAX_SCAN_INTERVAL,
+    DEFAULT_SCAN_INTERVAL,
+    DEFAULT_TARGET,
+    DISCOVERY,
+    DISCOVERY_CACHE_TIME,
+    DISCOVERY_TARGETS,
+    DOMAIN,
+    PROBE_TIMEOUT,
+)
 from . import StarlinkClass
+from .channel import StarlinkChannel
 
+_LOGGER = logging.getLogger(__name__)
 
-async def _async_has_devices(hass) -> bool:
-    """Return if there are devices that can be discovered."""
-    api_client = StarlinkClass()
 
-    devices = await api_client.get()
-    return len(devices) > 0
+async def _async_probe(hass, target: str, retry: bool = False) -> Optional[str]:
+    """Return the id of the dish at target, or None if none answers.
 
+    Only get_id is called, with a deadline of PROBE_TIMEOUT, so a missing
+    dish costs at most that long. Results are cached for
+    DISCOVERY_CACHE_TIME; with retry set, a cached failure is probed again.
+    """
+    cache = hass.data.setdefault(DOMAIN, {}).setdefault(DISCOVERY, {})
+    cached = cache.get(target)
+    if (cached is not None and time.monotonic() - cached[0] < DISCOVERY_CACHE_TIME
+            and not (retry and cached[1] is None)):
+        return cached[1]
 
-config_entry_flow.register_discovery_flow(
-    DOMAIN,
-    "Starlink Statistics and Alerts",
-    _async_has_devices,
-)
+    channel = StarlinkChannel(target)
+    api_client = StarlinkClass(channel, timeout=PROBE_TIMEOUT)
+    try:
+        dish_id = await api_client.get_id()
+    except ConnectionError as error:
+        _LOGGER.debug("No dish at %s: %s", target, error)
+        dish_id = None
+    finally:
+        await api_client.async_shutdown()
+        channel.shutdown()
+    cache[target] = (time.monotonic(), dish_id)
+    return dish_id
+
+
+async def _async_discover(hass) -> Dict[str, str]:
+    """Probe every DISCOVERY_TARGETS candidate at once.
+
+    Returns the dish id found at each target that answered, listing each dish
+    only under the first target it answered on.
+    """
+    results = await asyncio.gather(
+        *(_async_probe(hass, target) for target in DISCOVERY_TARGETS))
+    found = {}
+    for target, dish_id in zip(DISCOVERY_TARGETS, results):
+        if dish_id is not None and dish_id not in found.values():
+            found[target] = dish_id
+    return found
+
+
+class StarlinkFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
+    """Add a dish by its gRPC target, one config entry per dish."""
+
+    VERSION = 2
+
+    async def async_step_user(self, user_input=None):
+        """Ask for the dish target and check that a dish answers there."""
+        errors = {}
+        if user_input is not None:
+            target = user_input[CONF_HOST]
+            dish_id = await _async_probe(self.hass, target, retry=True)
+            if dish_id is None:
+                errors["base"] = "cannot_connect"
+            else:
+                await self.async_set_unique_id(dish_id)
+                self._abort_if_unique_id_configured(updates={CONF_HOST: target})
+                return self.async_create_entry(
+                    title=f"Starlink {target}", data={CONF_HOST: target})
+            default = target
+        else:
+            # Suggest the first dish found that is not set up yet.
+            configured = self._async_current_ids()
+            found = await _async_discover(self.hass)
+            default = next(
+                (target for target, dish_id in found.items() if dish_id not in configured),
+                DEFAULT_TARGET,
+            )
+
+        schema = vol.Schema({vol.Required(CONF_HOST, default=default): str})
+        return self.async_show_form(step_id="user", data_schema=schema, errors=errors)
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        """Get the options flow for this handler."""
+        return StarlinkOptionsFlowHandler(config_entry)
+
+
+class StarlinkOptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle the polling options."""
+
+    def __init__(self, config_entry):
+        """Initialize options flow."""
+        self.config_entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        """Manage the polling options."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
+        schema = vol.Schema(
+            {
+                vol.Optional(
+                    CONF_SCAN_INTERVAL,
+                    default=options.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=3600)),
+                vol.Optional(
+                    CONF_MAX_SCAN_INTERVAL,
+                    default=options.get(CONF_MAX_SCAN_INTERVAL, DEFAULT_MAX_SCAN_INTERVAL),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=3600)),
+                vol.Optional(
+                    CONF_ADAPTIVE_POLLING,
+                    default=options.get(CONF_ADAPTIVE_POLLING, DEFAULT_ADAPTIVE_POLLING),
+                ): bool,
+            }
+        )
+        return self.async_show_form(step_id="init", data_schema=schema)
@@ -2,7 +2,74 @@
 
 DOMAIN = "starlink"
 COORDINATOR = "coordinator"
+COORDINATOR_SLOW = "coordinator_slow"
+COORDINATOR_HISTORY = "coordinator_history"
 SPACEX_API = "starlink_api"
+CHANNEL_POOL = "channel_pool"
+SCHEDULER = "scheduler"
+DISCOVERY = "discovery"
 ATTR_IDENTIFIERS = "identifiers"
 ATTR_MANUFACTURER = "manufacturer"
 ATTR_MODEL = "model"
+
+CONF_MAX_SCAN_INTERVAL = "max_scan_interval"
+CONF_ADAPTIVE_POLLING = "adaptive_polling"
+DEFAULT_SCAN_INTERVAL = 1
+DEFAULT_MAX_SCAN_INTERVAL = 30
+DEFAULT_ADAPTIVE_POLLING = True
+# Adaptive polling: multiply the interval by ADAPTIVE_BACKOFF while the link
+# is idle or the dish is unreachable, and drop back to the scan interval when
+# throughput moves by more than ADAPTIVE_THROUGHPUT_DELTA (absolute bps or
+# fraction of the previous value, whichever is larger) or an alert is active.
+# Every interval is spread by +/- ADAPTIVE_JITTER.
+ADAPTIVE_BACKOFF = 2
+ADAPTIVE_JITTER = 0.1
+ADAPTIVE_THROUGHPUT_DELTA = (100000, 0.1)
+
+# The slow tier refreshes location, version and alert detail on this interval,
+# and early whenever the fast tier sees one of TRANSITION_KEYS change.
+SLOW_SCAN_INTERVAL = 300
+TRANSITION_KEYS = ("state", "alerts", "software_version")
+# History stats are computed over the samples recorded since the last refresh.
+HISTORY_SCAN_INTERVAL = 60
+
+# Deadline in seconds for a single call to the dish.
+REQUEST_TIMEOUT = 5
+# Deadline for a whole history refresh: the history RPC, which keeps
+# REQUEST_TIMEOUT, plus computing the stats and storing the samples.
+HISTORY_TIMEOUT = 20
+# Upper bound on worker threads blocked on dish calls at any one time.
+EXECUTOR_WORKERS = 3
+
+DEFAULT_TARGET = "192.168.100.1:9200"
+# Targets probed for a dish when adding one, each with a deadline of
+# PROBE_TIMEOUT seconds. Dishes found are remembered for DISCOVERY_CACHE_TIME.
+DISCOVERY_TARGETS = (DEFAULT_TARGET, "dishy.starlink.com:9200")
+PROBE_TIMEOUT = 2
+DISCOVERY_CACHE_TIME = 60
+# The dish closes connections that ping more often than every 5 minutes, so
+# keepalive stays at that rate and only runs while a call is active. Dropped
+# connections are redialled by grpc with exponential backoff.
+CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 300000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 0),
+    ("grpc.initial_reconnect_backoff_ms", 1000),
+    ("grpc.min_reconnect_backoff_ms", 1000),
+    ("grpc.max_reconnect_backoff_ms", 30000),
+]
+
+# After BREAKER_THRESHOLD polls in a row fail, stop polling the dish and
+# probe it instead, starting every BREAKER_MIN_PROBE_INTERVAL seconds and
+# doubling up to BREAKER_MAX_PROBE_INTERVAL until it answers.
+BREAKER_THRESHOLD = 5
+BREAKER_MIN_PROBE_INTERVAL = 5
+BREAKER_MAX_PROBE_INTERVAL = 300
+
+# The get_history service returns stored per-second samples for at most
+# HISTORY_SERVICE_MAX_SPAN seconds per call.
+SERVICE_GET_HISTORY = "get_history"
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_START = "start"
+ATTR_END = "end"
+HISTORY_SERVICE_MAX_SPAN = 24 * 3600
@@ -0,0 +1,40 @@
+"""Per-call deadlines for RPCs on a shared grpc channel."""
+from collections import namedtuple
+import time
+
+import grpc
+
+
+class _CallDetails(
+        namedtuple("_CallDetails", ("method", "timeout", "metadata", "credentials",
+                                    "wait_for_ready", "compression")),
+        grpc.ClientCallDetails):
+    pass
+
+
+class _DeadlineInterceptor(grpc.UnaryUnaryClientInterceptor):
+    """Cap the timeout of every RPC at the time left until deadline."""
+
+    def __init__(self, deadline: float):
+        self._deadline = deadline
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        remaining = max(self._deadline - time.monotonic(), 0.0)
+        timeout = client_call_details.timeout
+        return continuation(_CallDetails(
+            client_call_details.method,
+            remaining if timeout is None else min(timeout, remaining),
+            client_call_details.metadata,
+            client_call_details.credentials,
+            getattr(client_call_details, "wait_for_ready", None),
+            getattr(client_call_details, "compression", None),
+        ), request)
+
+
+def with_deadline(channel: grpc.Channel, deadline: float) -> grpc.Channel:
+    """Return channel with its RPCs ending by monotonic time deadline.
+
+    grpc ends an RPC whose deadline passes, and only that RPC, so other
+    calls in flight on the same channel are unaffected.
+    """
+    return grpc.intercept_channel(channel, _DeadlineInterceptor(deadline))
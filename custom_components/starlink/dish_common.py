@@ -11,25 +11,126 @@ Note:
 """
 
 import argparse
+import asyncio
+from dataclasses import dataclass
 from datetime import datetime
 from datetime import timezone
 import logging
 import re
 import time
-from typing import List
+from typing import Any, AsyncIterator, Dict, List, Sequence, Tuple
 
 import grpc
+import numpy as np
 
 import starlink_grpc
 
+from .ring import HistoryAccumulator, HistoryRing
+from .stats import history_stats
+
+# What DishCommon.stream does with a record when its queue is full: wait for
+# room, which holds off the next poll, or drop the oldest or newest record.
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+_END = object()
+
+
+@dataclass(frozen=True)
+class StatusRecord:
+    """Status data from one poll (category "status").
+
+    sequences maps name to a (value, start_index_label) tuple.
+    """
+
+    timestamp: int
+    items: Dict[str, Any]
+    sequences: Dict[str, Tuple[Sequence, int]]
+
+
+@dataclass(frozen=True)
+class HistoryStatsRecord:
+    """History stats of one category from one poll."""
+
+    timestamp: int
+    category: str
+    items: Dict[str, Any]
+    sequences: Dict[str, Tuple[Sequence, int]]
+
+
+@dataclass(frozen=True)
+class BulkRecord:
+    """Bulk history samples from one poll.
+
+    Sample i of each column has dish counter counter + i and was recorded at
+    timestamp + i. The columns are copies, so they stay valid however long
+    the record is held.
+    """
+
+    timestamp: int
+    counter: int
+    samples: int
+    columns: Dict[str, np.ndarray]
+
+
+class LoopScheduler:
+    """Deadline-based timing of a polling loop, on the monotonic clock.
+
+    Tick k is due at start + k * interval, however long each poll takes, so
+    the loop does not drift the way sleeping a fixed interval after each poll
+    does. Call start_tick when a poll starts and sleep (or await
+    asyncio.sleep(delay())) between polls.
+
+    If a poll overran one or more deadlines, those ticks are skipped rather
+    than run back to back, and start_tick reports how many ticks the next
+    poll has to cover; get_data then widens its history request to match
+    (see GlobalState.ticks). How late each tick started, its jitter, is kept
+    in jitter and max_jitter.
+    """
+
+    def __init__(self, interval: float, clock=time.monotonic):
+        self.interval = interval
+        self._clock = clock
+        self._deadline = None
+        self.ticks = 0
+        self.missed = 0
+        self.jitter = 0.0
+        self.max_jitter = 0.0
+
+    def start_tick(self) -> int:
+        """Note that a poll is starting. Returns the number of ticks it covers."""
+        now = self._clock()
+        if self._deadline is None:
+            self._deadline = now
+        behind = int((now - self._deadline) // self.interval) if now > self._deadline else 0
+        self._deadline += behind * self.interval
+        self.jitter = now - self._deadline
+        self.max_jitter = max(self.max_jitter, self.jitter)
+        self.missed += behind
+        self.ticks += 1
+        self._deadline += self.interval
+        if behind:
+            logging.debug("Polling loop fell %d ticks behind", behind)
+        return behind + 1
+
+    def delay(self) -> float:
+        """Return the seconds until the next tick is due."""
+        return max(self._deadline - self._clock(), 0.0) if self._deadline is not None else 0.0
+
+    def sleep(self):
+        """Block until the next tick is due."""
+        time.sleep(self.delay())
+
 
 class DishCommon:
 
     def __init__(self):
-        pass
+        # Parsed key layouts, keyed by the tuple of keys of a data group.
+        self._layouts = {}
 
     BRACKETS_RE = re.compile(r"([^[]*)(\[((\d+),|)(\d*)\]|)$")
     LOOP_TIME_DEFAULT = 0
+    STREAM_QUEUE_SIZE = 16
     STATUS_MODES: List[str] = [
         "status", "obstruction_detail", "alert_detail", "location"]
     HISTORY_STATS_MODES: List[str] = [
@@ -180,14 +281,127 @@ class DishCommon:
             self.dish_id = None
             self.context = starlink_grpc.ChannelContext(target=target)
             self.poll_count = 0
-            self.accum_history = None
+            # Loop intervals the next poll covers; more than 1 when a
+            # LoopScheduler loop fell behind.
+            self.ticks = 1
+            self.accum_history = HistoryAccumulator()
+            self.ring = HistoryRing()
+            # Optional BulkHistoryStore that bulk data is also appended to.
+            self.store = None
             self.first_poll = True
             self.warn_once_location = True
 
         def shutdown(self):
             self.context.close()
 
-    def get_data(self, opts, gstate, add_item, add_sequence, add_bulk=None, flush_history=False):
+    def poll_records(self, opts, gstate):
+        """Run get_data once and return what it reported as a list of records.
+
+        Blocks on the dish; see stream for the asyncio interface.
+        """
+        groups = {}
+        bulk_records = []
+
+        def add_group(items, sequences, category):
+            group_items, group_sequences = groups.setdefault(category, ({}, {}))
+            group_items.update(items)
+            group_sequences.update(sequences)
+
+        def add_item(name, value, category):
+            add_group({name: value}, {}, category)
+
+        def add_sequence(name, value, category, start):
+            add_group({}, {name: (value, start)}, category)
+
+        def add_bulk(bulk, samples, timestamp, counter):
+            bulk_records.append(BulkRecord(
+                timestamp, counter, samples,
+                {field: np.array(column) for field, column in bulk.items()}))
+
+        _, status_ts, hist_ts = self.get_data(
+            opts, gstate, add_item, add_sequence, add_bulk, add_group=add_group)
+
+        records = []
+        for category, (items, sequences) in groups.items():
+            if category == "status":
+                records.append(StatusRecord(status_ts, items, sequences))
+            else:
+                records.append(HistoryStatsRecord(hist_ts, category, items, sequences))
+        return records + bulk_records
+
+    async def stream(self, opts, gstate, interval=None, maxsize=None,
+                     policy=DROP_OLDEST, scheduler=None) -> AsyncIterator[Any]:
+        """Poll the dish and yield StatusRecord, HistoryStatsRecord and BulkRecord.
+
+        Usage:
+
+            async for record in dish.stream(opts, gstate):
+                ...
+
+        Polls run get_data for the modes in opts in the default executor,
+        every interval seconds (opts.loop_interval if not given; once if 0),
+        independently of how fast records are consumed. They are timed by
+        scheduler, a LoopScheduler for interval unless one is passed in to
+        read tick jitter from. Records wait in a
+        queue of maxsize (STREAM_QUEUE_SIZE if not given). When it is full,
+        policy decides: BLOCK holds off the next poll until there is room,
+        while DROP_OLDEST and DROP_NEWEST discard a record so polling keeps
+        its pace. Polling stops when the consumer stops iterating.
+        """
+        loop = asyncio.get_running_loop()
+        interval = opts.loop_interval if interval is None else interval
+        if scheduler is None and interval > 0.0:
+            scheduler = LoopScheduler(interval)
+        queue = asyncio.Queue(maxsize or self.STREAM_QUEUE_SIZE)
+        failure = []
+        dropped = 0
+
+        def put_nowait(record):
+            nonlocal dropped
+            if queue.full():
+                dropped += 1
+                if policy == DROP_NEWEST and record is not _END:
+                    return
+                queue.get_nowait()
+            queue.put_nowait(record)
+
+        async def poll():
+            try:
+                while True:
+                    if scheduler is not None:
+                        gstate.ticks = scheduler.start_tick()
+                    for record in await loop.run_in_executor(
+                            None, self.poll_records, opts, gstate):
+                        if policy == BLOCK:
+                            await queue.put(record)
+                        else:
+                            put_nowait(record)
+                    if scheduler is None:
+                        break
+                    await asyncio.sleep(scheduler.delay())
+            except Exception as e:  # pylint: disable=broad-except
+                failure.append(e)
+            if policy == BLOCK:
+                await queue.put(_END)
+            else:
+                put_nowait(_END)
+
+        task = loop.create_task(poll())
+        try:
+            while True:
+                record = await queue.get()
+                if record is _END:
+                    if failure:
+                        raise failure[0]
+                    return
+                yield record
+        finally:
+            task.cancel()
+            if dropped:
+                logging.debug("Stream dropped %d records", dropped)
+
+    def get_data(self, opts, gstate, add_item, add_sequence, add_bulk=None, flush_history=False,
+                 add_group=None):
         """Fetch data from the dish, pull it apart and call back with the pieces.
 
         This function uses call backs to return the useful data. If need_id is set
@@ -208,11 +422,24 @@ class DishCommon:
                 prototype:
 
                 add_bulk(bulk_data, count, start_timestamp, start_counter)
+
+                The bulk_data values are read-only float64 numpy arrays,
+                views into the history ring buffer in gstate that are valid
+                until the next call; they are not copied. Samples the dish
+                did not report are NaN.
             flush_history (bool): Optional. If true, run in a special mode that
                 emits (only) history stats for already polled data, if any,
                 regardless of --poll-loops state. Intended for script shutdown
                 operation, in order to flush stats for polled history data which
                 would otherwise be lost on script restart.
+            add_group (function): Optional. Call back for a whole category of
+                data at once, used instead of add_item and add_sequence for
+                everything but the "DISH_UNREACHABLE" state, with prototype:
+
+                add_group(items, sequences, category)
+
+                items maps name to value, and sequences maps name to a
+                (value, start_index_label) tuple.
 
         Returns:
             Tuple with 3 values. The first value is 1 if there were any failures
@@ -231,11 +458,11 @@ class DishCommon:
 
         if not flush_history:
             rc, status_ts = self.get_status_data(
-                opts, gstate, add_item, add_sequence)
+                opts, gstate, add_item, add_sequence, add_group)
 
         if opts.history_stats_mode and (not rc or opts.poll_loops > 1):
             hist_rc, hist_ts = self.get_history_stats(
-                opts, gstate, add_item, add_sequence, flush_history)
+                opts, gstate, add_item, add_sequence, flush_history, add_group)
             if not rc:
                 rc = hist_rc
 
@@ -244,28 +471,71 @@ class DishCommon:
 
         return rc, status_ts, hist_ts
 
-    def add_data_normal(self, data, category, add_item, add_sequence):
-        for key, val in data.items():
-            name, start, seq = self.BRACKETS_RE.match(key).group(1, 4, 5)
-            if seq is None:
-                add_item(name, val, category)
-            else:
-                add_sequence(name, val, category, int(start) if start else 0)
-
-    def add_data_numeric(self, data, category, add_item, add_sequence):
-        for key, val in data.items():
-            name, start, seq = self.BRACKETS_RE.match(key).group(1, 4, 5)
-            if seq is None:
-                add_item(name, int(val) if isinstance(
-                    val, int) else val, category)
-            else:
-                add_sequence(name,
-                             [int(subval) if isinstance(subval, int)
-                              else subval for subval in val],
-                             category,
-                             int(start) if start else 0)
+    def key_layout(self, data):
+        """Return the parsed layout of the keys of a data group.
+
+        Keys are parsed with BRACKETS_RE only the first time a given key set
+        is seen; the dish reports the same keys on every poll until its
+        firmware changes.
 
-    def get_status_data(self, opts, gstate, add_item, add_sequence):
+        Returns:
+            Tuple of the non-sequence fields, as (key, name) pairs, and the
+            sequence fields, as (key, name, start_index_label) tuples.
+        """
+        keys = tuple(data)
+        layout = self._layouts.get(keys)
+        if layout is None:
+            items = []
+            sequences = []
+            for key in keys:
+                name, start, seq = self.BRACKETS_RE.match(key).group(1, 4, 5)
+                if seq is None:
+                    items.append((key, name))
+                else:
+                    sequences.append((key, name, int(start) if start else 0))
+            layout = self._layouts[keys] = (tuple(items), tuple(sequences))
+        return layout
+
+    def add_data_normal(self, data, category, add_item, add_sequence, add_group=None):
+        items, sequences = self.key_layout(data)
+        if add_group is not None:
+            add_group({name: data[key] for key, name in items},
+                      {name: (data[key], start) for key, name, start in sequences},
+                      category)
+            return
+        for key, name in items:
+            add_item(name, data[key], category)
+        for key, name, start in sequences:
+            add_sequence(name, data[key], category, start)
+
+    @staticmethod
+    def _numeric_sequence(val):
+        """Return val with any bools as ints, in one pass unless it holds None."""
+        values = np.asarray(val)
+        if values.dtype.kind in "bi":
+            return values.astype(np.int64).tolist()
+        if values.dtype == np.object_:
+            return [int(subval) if isinstance(subval, int) else subval for subval in val]
+        return val
+
+    def add_data_numeric(self, data, category, add_item, add_sequence, add_group=None):
+        items, sequences = self.key_layout(data)
+        item_values = {
+            name: int(val) if isinstance(val, int) else val
+            for name, val in ((name, data[key]) for key, name in items)
+        }
+        sequence_values = {
+            name: (self._numeric_sequence(data[key]), start) for key, name, start in sequences
+        }
+        if add_group is not None:
+            add_group(item_values, sequence_values, category)
+            return
+        for name, val in item_values.items():
+            add_item(name, val, category)
+        for name, (val, start) in sequence_values.items():
+            add_sequence(name, val, category, start)
+
+    def get_status_data(self, opts, gstate, add_item, add_sequence, add_group=None):
         if opts.status_mode:
             timestamp = int(time.time())
             add_data = self.add_data_numeric if opts.numeric else self.add_data_normal
@@ -288,12 +558,16 @@ class DishCommon:
                 if opts.need_id:
                     gstate.dish_id = status_data["id"]
                     del status_data["id"]
+                # One batch for all the status groups.
+                status = {}
                 if "status" in opts.mode:
-                    add_data(status_data, "status", add_item, add_sequence)
+                    status.update(status_data)
                 if "obstruction_detail" in opts.mode:
-                    add_data(obstruct_detail, "status", add_item, add_sequence)
+                    status.update(obstruct_detail)
                 if "alert_detail" in opts.mode:
-                    add_data(alert_detail, "status", add_item, add_sequence)
+                    status.update(alert_detail)
+                if status:
+                    add_data(status, "status", add_item, add_sequence, add_group)
             if "location" in opts.mode:
                 try:
                     location = starlink_grpc.location_data(
@@ -306,7 +580,7 @@ class DishCommon:
                     # logging.warning(
                     #    "Location data not enabled. See README for more details.")
                     gstate.warn_once_location = False
-                add_data(location, "status", add_item, add_sequence)
+                add_data(location, "status", add_item, add_sequence, add_group)
             return 0, timestamp
         elif opts.need_id and gstate.dish_id is None:
             try:
@@ -319,105 +593,145 @@ class DishCommon:
 
         return 0, None
 
-    def get_history_stats(self, opts, gstate, add_item, add_sequence, flush_history):
-        """Fetch history stats.  See `get_data` for details."""
+    def get_history(self, opts, gstate):
+        """Fetch the history buffer from the dish.
+
+        The result can be passed to both get_history_stats and get_bulk_data,
+        so that a poll wanting both fetches the history only once.
+
+        Returns:
+            The history, or None if it could not be fetched, which has been
+            reported through conn_error.
+        """
+        try:
+            return starlink_grpc.get_history(context=gstate.context)
+        except (AttributeError, ValueError, grpc.RpcError) as e:
+            self.conn_error(opts, "Failure getting history: %s",
+                            str(starlink_grpc.GrpcError(e)))
+            return None
+
+    def get_history_stats(self, opts, gstate, add_item, add_sequence, flush_history,
+                          add_group=None, history=None):
+        """Fetch history stats.  See `get_data` for details.
+
+        history, if given, is used instead of fetching it from the dish.
+        """
         if flush_history or (opts.need_id and gstate.dish_id is None):
             history = None
         else:
-            try:
-                timestamp = int(time.time())
-                history = starlink_grpc.get_history(context=gstate.context)
+            timestamp = int(time.time())
+            if history is None:
+                history = self.get_history(opts, gstate)
+            if history is not None:
                 gstate.timestamp_stats = timestamp
-            except grpc.RpcError as e:
-                self.conn_error(opts, "Failure getting history: %s",
-                                str(starlink_grpc.GrpcError(e)))
-                history = None
 
         parse_samples = opts.samples if gstate.counter_stats is None else -1
+        if parse_samples > 0:
+            # Cover the samples of any loop intervals that were skipped.
+            parse_samples *= gstate.ticks
         start = gstate.counter_stats if gstate.counter_stats else None
 
         # Accumulate polled history data into gstate.accum_history, even if there
-        # was a dish reboot.
-        if gstate.accum_history:
-            if history is not None:
-                gstate.accum_history = starlink_grpc.concatenate_history(gstate.accum_history,
-                                                                         history,
-                                                                         samples1=parse_samples,
-                                                                         start1=start,
-                                                                         verbose=opts.verbose)
-                # Counter tracking gets too complicated to handle across reboots
-                # once the data has been accumulated, so just have concatenate
-                # handle it on the first polled loop and use a value of 0 to
-                # remember it was done (as opposed to None, which is used for a
-                # different purpose).
-                if not opts.no_counter:
-                    gstate.counter_stats = 0
-        else:
-            gstate.accum_history = history
+        # was a dish reboot. Only the first poll after stats were last computed
+        # is trimmed by parse_samples and start; later ones append whatever is
+        # new since the previous poll.
+        if history is not None:
+            accumulating = gstate.accum_history.current is not None
+            gstate.accum_history.append(history,
+                                        samples=parse_samples,
+                                        start=start,
+                                        verbose=opts.verbose)
+            # Counter tracking gets too complicated to handle across reboots
+            # once the data has been accumulated, so just have the first
+            # append handle it and use a value of 0 to remember it was done
+            # (as opposed to None, which is used for a different purpose).
+            if accumulating and not opts.no_counter:
+                gstate.counter_stats = 0
 
         # When resuming from prior count with --poll-loops set, advance the loop
         # count by however many loops worth of data was caught up on. This helps
         # avoid abnormally large sample counts in the first set of output data.
-        if gstate.first_poll and gstate.accum_history:
+        if gstate.first_poll and gstate.accum_history.current is not None:
             if opts.poll_loops > 1 and gstate.counter_stats:
                 new_samples = gstate.accum_history.current - gstate.counter_stats
                 if new_samples < 0:
                     new_samples = gstate.accum_history.current
-                if new_samples > len(gstate.accum_history.pop_ping_drop_rate):
-                    new_samples = len(gstate.accum_history.pop_ping_drop_rate)
+                if new_samples > len(gstate.accum_history):
+                    new_samples = len(gstate.accum_history)
                 gstate.poll_count = max(gstate.poll_count, int(
                     (new_samples-1) / opts.loop_interval))
             gstate.first_poll = False
 
+        # Skipped loop intervals count toward --poll-loops as well.
+        gstate.poll_count += gstate.ticks - 1
         if gstate.poll_count < opts.poll_loops - 1 and not flush_history:
             gstate.poll_count += 1
             return 0, None
 
         gstate.poll_count = 0
 
-        if gstate.accum_history is None:
+        if gstate.accum_history.current is None:
             return (0, None) if flush_history else (1, None)
 
-        groups = starlink_grpc.history_stats(parse_samples,
-                                             start=start,
-                                             verbose=opts.verbose,
-                                             history=gstate.accum_history)
+        groups = history_stats(parse_samples,
+                               start=start,
+                               verbose=opts.verbose,
+                               history=gstate.accum_history)
         general, ping, runlen, latency, loaded, usage = groups[0:6]
         add_data = self.add_data_numeric if opts.numeric else self.add_data_normal
-        add_data(general, "ping_stats", add_item, add_sequence)
+        # One batch for all the ping stats groups.
+        ping_stats = dict(general)
         if "ping_drop" in opts.mode:
-            add_data(ping, "ping_stats", add_item, add_sequence)
+            ping_stats.update(ping)
         if "ping_run_length" in opts.mode:
-            add_data(runlen, "ping_stats", add_item, add_sequence)
+            ping_stats.update(runlen)
         if "ping_latency" in opts.mode:
-            add_data(latency, "ping_stats", add_item, add_sequence)
+            ping_stats.update(latency)
         if "ping_loaded_latency" in opts.mode:
-            add_data(loaded, "ping_stats", add_item, add_sequence)
+            ping_stats.update(loaded)
+        add_data(ping_stats, "ping_stats", add_item, add_sequence, add_group)
         if "usage" in opts.mode:
-            add_data(usage, "usage", add_item, add_sequence)
+            add_data(usage, "usage", add_item, add_sequence, add_group)
         if not opts.no_counter:
             gstate.counter_stats = general["end_counter"]
 
         timestamp = gstate.timestamp_stats
         gstate.timestamp_stats = None
-        gstate.accum_history = None
+        gstate.accum_history.clear()
 
         return 0, timestamp
 
-    def get_bulk_data(self, opts, gstate, add_bulk):
-        """Fetch bulk data.  See `get_data` for details."""
+    def get_bulk_data(self, opts, gstate, add_bulk, history=None):
+        """Fetch bulk data.  See `get_data` for details.
+
+        history, if given, is used instead of fetching it from the dish.
+        """
         before = time.time()
 
         start = gstate.counter
         parse_samples = opts.bulk_samples if start is None else -1
-        try:
-            general, bulk = starlink_grpc.history_bulk_data(parse_samples,
-                                                            start=start,
-                                                            verbose=opts.verbose,
-                                                            context=gstate.context)
-        except starlink_grpc.GrpcError as e:
-            self.conn_error(opts, "Failure getting history: %s", str(e))
-            return 1
+        if history is None:
+            history = self.get_history(opts, gstate)
+            if history is None:
+                return 1
+
+        # Only the samples recorded since the last poll are copied into the
+        # ring; a counter reset (dish reboot) is picked up there as well.
+        new_samples, lost = gstate.ring.ingest(history)
+        if start is None or lost:
+            new_samples = gstate.ring.size
+        new_samples = min(new_samples, gstate.ring.size)
+        if parse_samples >= 0:
+            new_samples = min(new_samples, parse_samples)
+        if opts.verbose and lost:
+            print("Counter reset or gap detected, starting over from available samples")
+        general = {"samples": new_samples, "end_counter": gstate.ring.counter}
+        bulk = gstate.ring.latest(new_samples)
+        # Obsoleted in grpc service; one shared all-NaN column stands in.
+        missing = np.full(new_samples, np.nan)
+        missing.flags.writeable = False
+        for field in ("snr", "scheduled", "obstructed"):
+            bulk[field] = missing
 
         after = time.time()
         parsed_samples = general["samples"]
@@ -441,16 +755,20 @@ class DishCommon:
             timestamp -= parsed_samples
 
         if opts.numeric:
-            add_bulk(
-                {
-                    k: [int(subv) if isinstance(subv, int)
-                        else subv for subv in v]
-                    for k, v in bulk.items()
-                }, parsed_samples, timestamp, new_counter - parsed_samples)
-        else:
-            add_bulk(bulk, parsed_samples, timestamp,
-                     new_counter - parsed_samples)
+            # Every column is a float array already, so this only casts
+            # (in one step) a column that holds bools.
+            for field, column in bulk.items():
+                if column.dtype == np.bool_:
+                    bulk[field] = column.astype(np.int64)
+        add_bulk(bulk, parsed_samples, timestamp,
+                 new_counter - parsed_samples)
 
         gstate.counter = new_counter
         gstate.timestamp = timestamp + parsed_samples
+        if gstate.store is not None:
+            # Samples not stored are still reported; only the store misses them.
+            try:
+                gstate.store.append(bulk, parsed_samples, timestamp, new_counter - parsed_samples)
+            except OSError as e:
+                logging.warning("Failed to store history samples: %s", str(e))
         return 0
@@ -0,0 +1,207 @@
+"""Base entity and entity descriptions for the Starlink integration."""
+from dataclasses import dataclass
+import re
+from typing import Any, Callable, Iterable, Optional
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from . import StarlinkUpdateCoordinator
+from .const import COORDINATOR, COORDINATOR_SLOW, DOMAIN
+
+
+@dataclass(frozen=True)
+class StarlinkEntityDescription:
+    """Declarative definition of one entity backed by a payload key.
+
+    The value is data[key], or element index of it for sequence fields,
+    passed through convert if set, or through float(), scale and
+    round(precision) if precision is set. coordinator names the hass.data
+    entry of the polling tier that supplies key.
+    """
+
+    kind: str
+    name: str
+    key: str
+    icon: str = "mdi:information-outline"
+    convert: Optional[Callable[[Any], Any]] = None
+    scale: float = 1
+    precision: Optional[int] = None
+    unit: Optional[str] = None
+    device_class: Optional[str] = None
+    state_class: Optional[str] = None
+    deadband: float = 0
+    coordinator: str = COORDINATOR
+    index: Optional[int] = None
+    enabled_default: bool = True
+
+
+# Payload keys that are not dish fields in their own right.
+IGNORED_KEYS = frozenset(("id", "history"))
+# Sequence fields are named like "name[]", or "name[start,]" when the first
+# element is not index 0.
+SEQUENCE_RE = re.compile(r"([^[]*)\[(?:(\d+),)?\]$")
+
+
+def dynamic_descriptions(data: dict, seen: set, binary: bool) -> list:
+    """Describe the payload fields not in seen, and add them to seen.
+
+    Boolean fields are described only when binary is set, and all others only
+    when it is not. Fields whose value is still None are left for a later
+    call, since the dish may not report them yet. Sequence fields get one
+    description per element. The resulting entities are disabled by default,
+    so they only cost anything per refresh once a user enables them.
+    """
+    descriptions = []
+    for key, value in data.items():
+        if key in seen:
+            continue
+        if key in IGNORED_KEYS:
+            seen.add(key)
+            continue
+        values = value if isinstance(value, (list, tuple)) else (value,)
+        sample = next((item for item in values if item is not None), None)
+        if sample is None:
+            continue
+        seen.add(key)
+        if isinstance(sample, bool) != binary:
+            continue
+
+        match = SEQUENCE_RE.match(key)
+        name = match.group(1) if match else key
+        common = {
+            "key": key,
+            "convert": bool if binary else None,
+            "coordinator": COORDINATOR_SLOW if name.startswith("alert_") else COORDINATOR,
+            "enabled_default": False,
+        }
+        if match is None:
+            descriptions.append(StarlinkEntityDescription(
+                kind=f"starlink_{name}",
+                name=name.replace("_", " ").title(),
+                **common,
+            ))
+            continue
+        start = int(match.group(2) or 0)
+        for index in range(len(values)):
+            descriptions.append(StarlinkEntityDescription(
+                kind=f"starlink_{name}_{start + index}",
+                name=f"{name.replace('_', ' ').title()} {start + index}",
+                index=index,
+                **common,
+            ))
+    return descriptions
+
+
+@callback
+def async_add_new_fields(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+    entity_class: type,
+    known: Iterable[StarlinkEntityDescription],
+    binary: bool,
+):
+    """Add entity_class entities for the fields the dish reports beyond known.
+
+    Each field gets a disabled-by-default entity the first time it shows up
+    in the payload. binary picks the platform's fields, as for
+    dynamic_descriptions.
+    """
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    coordinator = entry_data[COORDINATOR]
+    seen = {description.key for description in known}
+
+    @callback
+    def _async_add_new_fields():
+        if coordinator.data and not seen.issuperset(coordinator.data):
+            new = dynamic_descriptions(coordinator.data, seen, binary)
+            if new:
+                async_add_entities([
+                    entity_class(entry_data[description.coordinator], description, entry.unique_id)
+                    for description in new
+                ])
+
+    _async_add_new_fields()
+    entry.async_on_unload(coordinator.async_add_listener(_async_add_new_fields))
+
+
+def make_accessor(description: StarlinkEntityDescription) -> Callable[[dict], Any]:
+    """Build the function that reads an entity's value from the payload."""
+    key = description.key
+    index = description.index
+    if index is None:
+        def read(data):
+            return data.get(key)
+    else:
+        def read(data):
+            values = data.get(key)
+            return values[index] if values and index < len(values) else None
+
+    if description.precision is not None:
+        scale = description.scale
+        precision = description.precision
+
+        def accessor(data):
+            value = read(data)
+            return None if value is None else round(float(value) * scale, precision)
+    elif description.convert is not None:
+        convert = description.convert
+
+        def accessor(data):
+            value = read(data)
+            return None if value is None else convert(value)
+    else:
+        accessor = read
+
+    return accessor
+
+
+class StarlinkEntity(Entity):
+    """An entity backed by one key of the coordinator payload of one dish.
+
+    The state is only written when the coordinator reports that key changed
+    by more than the entity's deadband, or when availability changes.
+    """
+
+    def __init__(
+        self,
+        coordinator: StarlinkUpdateCoordinator,
+        description: StarlinkEntityDescription,
+        dish_id: str,
+    ):
+        """Initialize the coordinator subscription."""
+        self.coordinator = coordinator
+        self._description = description
+        self._key = description.key
+        self._deadband = description.deadband
+        self._value = make_accessor(description)
+        self._attr_unique_id = f"{dish_id}_{description.kind}"
+        self._attr_name = description.name
+        self._attr_icon = description.icon
+        self._attr_device_class = description.device_class
+        self._attr_entity_registry_enabled_default = description.enabled_default
+
+    @property
+    def should_poll(self) -> bool:
+        """No need to poll. Coordinator notifies entity of updates."""
+        return False
+
+    @property
+    def available(self) -> bool:
+        """Return if entity is available."""
+        return self.coordinator.last_update_success and self.coordinator.data is not None
+
+    async def async_update(self):
+        """Update Starlink Entity."""
+        await self.coordinator.async_request_refresh()
+
+    async def async_added_to_hass(self):
+        """Subscribe to changes of the backing key."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.async_add_key_listener(
+                self._key, self.async_write_ha_state, self._deadband)
+        )
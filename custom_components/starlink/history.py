@@ -0,0 +1,99 @@
+"""History statistics for the Starlink integration, computed by dish_common."""
+import argparse
+import logging
+import threading
+
+from .breaker import BusyError
+from .dish_common import DishCommon
+from .rollup import Rollups
+from .store import BulkHistoryStore
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class StarlinkHistory(DishCommon):
+    """Run the dish_common history stats pipeline incrementally.
+
+    The sample counter is tracked in the global state across calls, so the
+    first call covers every sample in the dish's history buffer and each
+    later call only parses the samples recorded since the one before.
+
+    The per-second samples are also rolled up into fixed-period buckets and,
+    if path is set, kept in a BulkHistoryStore there.
+    """
+
+    def __init__(self, path: str = None):
+        super().__init__()
+        self.opts = argparse.Namespace(
+            mode=list(self.HISTORY_STATS_MODES),
+            history_stats_mode=True,
+            samples=-1,
+            bulk_samples=-1,
+            no_counter=False,
+            poll_loops=1,
+            loop_interval=0.0,
+            numeric=False,
+            verbose=False,
+            need_id=False,
+            no_stdout_errors=True,
+        )
+        self.gstate = self.GlobalState()
+        if path is not None:
+            self.gstate.store = BulkHistoryStore(path)
+        self.rollups = Rollups()
+        # Held by fetch, which may outlive its caller's deadline.
+        self._fetching = threading.Lock()
+
+    def conn_error(self, opts, msg, *args):
+        """Leave reporting of connection errors to the coordinator."""
+        _LOGGER.debug(msg, *args)
+
+    def fetch(self, context):
+        """Return the stats for the samples since the last call.
+
+        context is the channel to fetch the history over.
+
+        Sequence stats are returned as lists under their name without the
+        brackets. The latest rollups are included as well.
+
+        Raises:
+            BusyError: A previous fetch that timed out is still running.
+            ConnectionError: The history could not be fetched from the dish.
+        """
+        if not self._fetching.acquire(blocking=False):
+            raise BusyError("Previous history fetch still running")
+        try:
+            return self._fetch(context)
+        finally:
+            self._fetching.release()
+
+    def _fetch(self, context):
+        self.gstate.context = context
+        # One fetch feeds both the bulk samples and the stats.
+        history = self.get_history(self.opts, self.gstate)
+        if history is None:
+            raise ConnectionError("Failure getting history")
+
+        def add_bulk(bulk, count, timestamp, counter):
+            self.rollups.add(bulk, count, timestamp)
+
+        if self.get_bulk_data(self.opts, self.gstate, add_bulk, history):
+            raise ConnectionError("Failure getting history")
+        data = dict(self.rollups.values)
+
+        def add_item(name, value, category):
+            data[name] = value
+
+        def add_sequence(name, value, category, start):
+            data[name] = list(value)
+
+        def add_group(items, sequences, category):
+            data.update(items)
+            for name, (value, _) in sequences.items():
+                data[name] = list(value)
+
+        rc, _ = self.get_history_stats(
+            self.opts, self.gstate, add_item, add_sequence, False, add_group, history)
+        if rc:
+            raise ConnectionError("Failure getting history")
+        return data
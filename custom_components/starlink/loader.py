@@ -0,0 +1,50 @@
+"""One-time loading of the gRPC stack, off the event loop."""
+import asyncio
+import logging
+import time
+from types import ModuleType
+from typing import NamedTuple, Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class GrpcStack(NamedTuple):
+    """The modules that talk to the dish, and how long they took to import."""
+
+    grpc: ModuleType
+    starlink_grpc: ModuleType
+    history: ModuleType
+    import_time: float
+
+
+_stack: Optional[GrpcStack] = None
+_lock: Optional[asyncio.Lock] = None
+
+
+def _import_stack() -> GrpcStack:
+    start = time.perf_counter()
+    import grpc
+    import starlink_grpc
+    # The history pipeline pulls in dish_common and numpy.
+    from . import history
+    return GrpcStack(grpc, starlink_grpc, history, time.perf_counter() - start)
+
+
+async def async_import_stack() -> GrpcStack:
+    """Return the gRPC stack, importing it in the executor on first use.
+
+    grpc, protobuf, starlink_grpc and numpy take long enough to import on
+    low-power hosts that doing it on the event loop would stall HA. Later
+    calls return the already imported stack without leaving the loop.
+    """
+    global _stack, _lock  # pylint: disable=global-statement
+    if _stack is not None:
+        return _stack
+    if _lock is None:
+        _lock = asyncio.Lock()
+    async with _lock:
+        if _stack is None:
+            stack = await asyncio.get_running_loop().run_in_executor(None, _import_stack)
+            _LOGGER.info("Imported the gRPC stack in %.3f s", stack.import_time)
+            _stack = stack
+    return _stack
@@ -0,0 +1,238 @@
+"""Array-backed stores for the dish's per-second history samples."""
+import math
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+import starlink_grpc
+
+from .stats import sample_indexes
+
+# Bulk history columns, and the history attribute each one is read from.
+BULK_FIELDS = {
+    "pop_ping_drop_rate": "pop_ping_drop_rate",
+    "pop_ping_latency_ms": "pop_ping_latency_ms",
+    "downlink_throughput_bps": "downlink_throughput_bps",
+    "uplink_throughput_bps": "uplink_throughput_bps",
+    "power_w": "power_in",
+}
+DEFAULT_CAPACITY = 3600
+# A day of samples.
+DEFAULT_ACCUM_SAMPLES = 86400
+INITIAL_ACCUM_SAMPLES = 1024
+
+
+class HistoryRing:
+    """A preallocated circular buffer of history samples, keyed by counter.
+
+    Each ingest copies only the samples the dish recorded since the previous
+    one out of the history response, rather than decoding the whole ring
+    into Python lists. Every sample is stored twice, at slot and slot +
+    capacity, so any run of up to capacity consecutive samples is one
+    contiguous slice and can be handed out as a view without copying.
+
+    Values the dish does not report are NaN, as is the latency of samples
+    with 100% ping drop.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.columns = {
+            field: np.full(2 * capacity, math.nan) for field in BULK_FIELDS
+        }
+        # Counter value one past the newest sample held, and number of
+        # consecutive samples held ending there.
+        self.counter: Optional[int] = None
+        self.size = 0
+
+    def ingest(self, history) -> Tuple[int, bool]:
+        """Copy the samples newer than the last ingest out of history.
+
+        Args:
+            history: A grpc history object, as returned by
+                starlink_grpc.get_history.
+
+        Returns:
+            A tuple of the number of new samples and whether continuity with
+            the previously held samples was lost, either because the dish
+            rebooted (its counter went backwards) or because more samples
+            went by than its ring holds.
+        """
+        try:
+            current = int(history.current)
+            ring_size = len(history.pop_ping_drop_rate)
+        except (AttributeError, TypeError):
+            return 0, False
+        available = min(ring_size, current)
+
+        lost = False
+        if self.counter is None or current < self.counter:
+            lost = self.counter is not None
+            new = available
+        else:
+            new = current - self.counter
+            if new > available:
+                lost = True
+                new = available
+        if lost:
+            self.size = 0
+
+        kept = min(new, self.capacity)
+        if kept:
+            values = {
+                field: self._tail(getattr(history, source, None), ring_size, current, kept)
+                for field, source in BULK_FIELDS.items()
+            }
+            values["pop_ping_latency_ms"] = np.where(
+                values["pop_ping_drop_rate"] >= 1, math.nan, values["pop_ping_latency_ms"])
+            slots = np.arange(current - kept, current) % self.capacity
+            for field, column in self.columns.items():
+                column[slots] = values[field]
+                column[slots + self.capacity] = values[field]
+
+        self.counter = current
+        self.size = min(self.size + new, self.capacity)
+        return new, lost
+
+    @staticmethod
+    def _tail(source, ring_size, current, count):
+        """Return the newest count samples of one ring field, oldest first."""
+        if source is None or len(source) != ring_size:
+            return math.nan
+        end = current % ring_size
+        start = (current - count) % ring_size
+        if start < end:
+            return np.asarray(source[start:end], dtype=float)
+        return np.concatenate((
+            np.asarray(source[start:], dtype=float),
+            np.asarray(source[:end], dtype=float),
+        ))
+
+    def latest(self, count: int) -> Dict[str, np.ndarray]:
+        """Return views of the newest count samples (at most size), oldest first."""
+        count = max(0, min(count, self.size))
+        if self.counter is None:
+            return {field: self.columns[field][0:0] for field in BULK_FIELDS}
+        start = (self.counter - count) % self.capacity
+        views = {}
+        for field, column in self.columns.items():
+            view = column[start:start + count]
+            view.flags.writeable = False
+            views[field] = view
+        return views
+
+
+class HistoryAccumulator:
+    """Unwrapped history accumulated across polls, one float column per field.
+
+    This stands in for the history objects starlink_grpc.concatenate_history
+    returns: it has current, unwrapped and a sequence attribute per history
+    field, so history_stats can read it directly. Samples are appended in
+    place instead of copying everything accumulated so far on each poll.
+
+    Each column is a buffer with room for twice max_samples, written from the
+    front; when it fills, the newest max_samples are moved back to the front,
+    evicting the rest. Appends are therefore amortized O(1) per sample and the
+    held samples are always one contiguous slice. Buffers start small and
+    double in size up to that bound.
+    """
+
+    unwrapped = True
+
+    def __init__(self, max_samples: int = DEFAULT_ACCUM_SAMPLES):
+        self.max_samples = max_samples
+        self._columns: Dict[str, np.ndarray] = {}
+        self._size = 0
+        self._start = 0
+        self._end = 0
+        self.current: Optional[int] = None
+
+    def __len__(self):
+        return self._end - self._start
+
+    def __getattr__(self, name):
+        # Only reached for attributes not set on the instance.
+        columns = self.__dict__.get("_columns")
+        if columns is None or name not in columns:
+            raise AttributeError(name)
+        view = columns[name][self._start:self._end]
+        view.flags.writeable = False
+        return view
+
+    def clear(self):
+        """Drop all samples, keeping the buffers for reuse."""
+        self._start = 0
+        self._end = 0
+        self.current = None
+
+    def append(self, history, samples: int = -1, start: Optional[int] = None, verbose: bool = False):
+        """Append the samples of history newer than those already held.
+
+        When empty, the samples to take are chosen by samples and start, as
+        for starlink_grpc.history_stats. Otherwise, like concatenate_history,
+        samples are appended even across a dish reboot or a gap, so the
+        result may be discontiguous. Fields missing from any appended history
+        are dropped.
+        """
+        try:
+            ring_size = len(history.pop_ping_drop_rate)
+            current = int(history.current)
+        except (AttributeError, TypeError):
+            return
+
+        if self.current is not None:
+            samples = current - self.current
+            start = None
+            if samples < 0:
+                if verbose:
+                    print("Dish reboot detected. Appending anyway.")
+                samples = min(current, ring_size)
+            elif samples > ring_size:
+                if verbose:
+                    print("WARNING: Appending discontiguous samples. Polling interval probably too short.")
+                samples = ring_size
+        indexes, count, _ = sample_indexes(history, samples, start)
+        if count > self.max_samples:
+            indexes = indexes[-self.max_samples:]
+            count = self.max_samples
+
+        fields = [field for field in starlink_grpc.HISTORY_FIELDS if hasattr(history, field)]
+        if self.current is None:
+            self._columns = {field: self._columns.get(field) for field in fields}
+        else:
+            for field in set(self._columns).difference(fields):
+                del self._columns[field]
+        self._reserve(count)
+        for field in self._columns:
+            source = getattr(history, field)
+            if len(source) == ring_size:
+                values = np.asarray(source, dtype=float)[indexes]
+            else:
+                values = math.nan
+            self._columns[field][self._end:self._end + count] = values
+        self._end += count
+        if len(self) > self.max_samples:
+            self._start = self._end - self.max_samples
+        self.current = current
+
+    def _reserve(self, count: int):
+        """Make room for count more samples after the held ones."""
+        if self._end + count <= self._size and all(column is not None for column in self._columns.values()):
+            return
+        keep = len(self)
+        size = self._size
+        if keep + count > size:
+            size = max(size, INITIAL_ACCUM_SAMPLES)
+            while size < keep + count:
+                size *= 2
+            size = min(size, 2 * self.max_samples)
+        # Otherwise the buffers are at their bound, so evict by moving the
+        # newest samples back to the front.
+        for field, column in self._columns.items():
+            buffer = column if column is not None and len(column) == size else np.full(size, math.nan)
+            if keep:
+                buffer[:keep] = column[self._end - keep:self._end]
+            self._columns[field] = buffer
+        self._size = size
+        self._start = 0
+        self._end = keep
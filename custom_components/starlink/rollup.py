@@ -0,0 +1,97 @@
+"""Fixed-period rollups of per-second bulk history samples."""
+import math
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+# Rolled up bulk fields, and the bucket lengths in seconds with their labels.
+ROLLUP_FIELDS = (
+    "pop_ping_latency_ms",
+    "downlink_throughput_bps",
+    "uplink_throughput_bps",
+    "pop_ping_drop_rate",
+)
+ROLLUP_PERIODS = {60: "1m", 900: "15m", 3600: "1h"}
+ROLLUP_STATS = ("min", "max", "mean", "p95")
+
+
+def rollup_key(field: str, period: int, stat: str) -> str:
+    """Return the payload key of one rollup value."""
+    return f"{field}_{ROLLUP_PERIODS[period]}_{stat}"
+
+
+class Rollups:
+    """Summaries of the last completed bucket of each period.
+
+    Buckets are aligned to UTC clock time, so the 15 minute bucket covers
+    :00-:15, :15-:30 and so on. Samples are kept only for twice the longest
+    period, enough to hold a whole bucket plus whatever arrived after it
+    closed, and each time a bucket closes its min, max, mean and 95th percentile are
+    computed from them in one pass, so the values change once per bucket
+    rather than every second. Samples with no value (NaN) are left out; a
+    bucket with none at all rolls up to None.
+    """
+
+    def __init__(self, fields: Iterable[str] = ROLLUP_FIELDS,
+                 periods: Iterable[int] = tuple(ROLLUP_PERIODS)):
+        self.fields = tuple(fields)
+        self.periods = tuple(periods)
+        self._window = 2 * max(self.periods)
+        self._timestamps = np.zeros(0, dtype=np.int64)
+        self._columns = {field: np.zeros(0) for field in self.fields}
+        # Index (timestamp // period) of the bucket the newest sample is in.
+        self._buckets: Dict[int, Optional[int]] = dict.fromkeys(self.periods)
+        self.values = {
+            rollup_key(field, period, stat): None
+            for field in self.fields for period in self.periods for stat in ROLLUP_STATS
+        }
+
+    def add(self, bulk: dict, samples: int, timestamp: int):
+        """Add samples as passed to a get_bulk_data add_bulk callback."""
+        if not samples:
+            return
+        if len(self._timestamps) and timestamp <= self._timestamps[-1]:
+            # The time base moved backwards, so bucket boundaries seen so
+            # far no longer line up; start over.
+            self._timestamps = self._timestamps[:0]
+            self._columns = {field: column[:0] for field, column in self._columns.items()}
+            self._buckets = dict.fromkeys(self.periods)
+
+        # Index of the first held sample still within the window after this.
+        first = max(len(self._timestamps) + samples - self._window, 0)
+        self._timestamps = np.concatenate((
+            self._timestamps[first:],
+            np.arange(timestamp, timestamp + samples)[-self._window:],
+        ))
+        for field in self.fields:
+            values = bulk.get(field)
+            values = np.full(min(samples, self._window), math.nan) if values is None \
+                else np.asarray(values[-self._window:], dtype=float)
+            self._columns[field] = np.concatenate((self._columns[field][first:], values))
+
+        newest = int(self._timestamps[-1])
+        for period in self.periods:
+            bucket = newest // period
+            last_bucket = self._buckets[period]
+            self._buckets[period] = bucket
+            # Roll up the newest completed bucket, provided the samples seen
+            # cover it from its start.
+            start = (bucket - 1) * period
+            if last_bucket is None and self._timestamps[0] > start:
+                continue
+            if last_bucket is not None and last_bucket >= bucket:
+                continue
+            self._roll_up(period, start)
+
+    def _roll_up(self, period: int, start: int):
+        in_bucket = (self._timestamps >= start) & (self._timestamps < start + period)
+        for field in self.fields:
+            values = self._columns[field][in_bucket]
+            values = values[~np.isnan(values)]
+            if len(values):
+                stats = (values.min(), values.max(), values.mean(), np.percentile(values, 95))
+                stats = [float(stat) for stat in stats]
+            else:
+                stats = [None] * len(ROLLUP_STATS)
+            for stat, value in zip(ROLLUP_STATS, stats):
+                self.values[rollup_key(field, period, stat)] = value
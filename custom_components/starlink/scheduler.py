@@ -0,0 +1,73 @@
+"""Poll staggering shared by the coordinators of every dish."""
+import asyncio
+from typing import Optional
+
+from homeassistant.core import CALLBACK_TYPE, callback
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+
+
+class PollScheduler:
+    """Give every registered coordinator its own offset within the second.
+
+    Offsets are evenly spaced over the second and re-spread whenever a
+    coordinator joins or leaves, so N dishes, each with several polling
+    tiers, poll at distinct points in the second rather than in the same
+    event loop tick.
+    """
+
+    def __init__(self):
+        self._coordinators = []
+
+    @callback
+    def async_register(self, coordinator: DataUpdateCoordinator) -> CALLBACK_TYPE:
+        """Give coordinator its own slot. Returns a function that frees it."""
+        self._coordinators.append(coordinator)
+
+        @callback
+        def unregister():
+            self._coordinators.remove(coordinator)
+
+        return unregister
+
+    def offset(self, coordinator: DataUpdateCoordinator) -> float:
+        """Return the seconds into each second that coordinator polls at, 0 if unregistered."""
+        if coordinator not in self._coordinators:
+            return 0.0
+        return self._coordinators.index(coordinator) / len(self._coordinators)
+
+    async def async_first_refresh(self, coordinator: DataUpdateCoordinator):
+        """Refresh coordinator once its slot comes up."""
+        delay = (self.offset(coordinator) - asyncio.get_running_loop().time()) % 1
+        if delay:
+            await asyncio.sleep(delay)
+        await coordinator.async_refresh()
+
+
+class ScheduledCoordinator(DataUpdateCoordinator):
+    """A DataUpdateCoordinator whose refreshes start at its scheduler offset."""
+
+    scheduler: Optional[PollScheduler] = None
+
+    @callback
+    def _schedule_refresh(self) -> None:
+        # DataUpdateCoordinator puts every refresh at a whole second plus an
+        # offset of its own; replace that with the scheduler's.
+        super()._schedule_refresh()
+        if self.scheduler is None or self._unsub_refresh is None:
+            return
+        self._unsub_refresh()
+        loop = self.hass.loop
+        when = (int(loop.time()) + self.scheduler.offset(self)
+                + self.update_interval.total_seconds())
+        self._unsub_refresh = loop.call_at(when, self._async_start_refresh).cancel
+
+    @callback
+    def _async_start_refresh(self):
+        # As DataUpdateCoordinator does since HA 2024.3, so polls never hold
+        # up startup; the config entry's tasks are cancelled on unload.
+        refresh = self._handle_refresh_interval(None)
+        name = f"{self.name} scheduled refresh"
+        if self.config_entry is not None:
+            self.config_entry.async_create_background_task(self.hass, refresh, name)
+        else:
+            self.hass.async_create_background_task(refresh, name)
@@ -1,199 +1,345 @@
-"""Definition and setup of the Starlink Binary Sensors for Home Assistant."""
+"""Definition and setup of the Starlink Sensors for Home Assistant."""
 
 import logging
-import time
-import datetime
-
-from homeassistant.util.dt import as_local, utc_from_timestamp
-from homeassistant.components.sensor import ENTITY_ID_FORMAT, DEVICE_CLASS_TIMESTAMP
-from homeassistant.const import DATA_RATE_MEGABITS_PER_SECOND, PERCENTAGE, TIME_MILLISECONDS, TIME_SECONDS, ATTR_NAME, CONF_LATITUDE, CONF_LONGITUDE, CONF_ELEVATION
-from homeassistant.helpers.entity import Entity
-from homeassistant.helpers.update_coordinator import (
-    CoordinatorEntity
+
+from homeassistant.components.sensor import SensorDeviceClass, SensorEntity, SensorStateClass
+from homeassistant.const import (
+    PERCENTAGE,
+    ATTR_NAME,
+    CONF_LATITUDE,
+    CONF_LONGITUDE,
+    CONF_ELEVATION,
+    UnitOfDataRate,
+    UnitOfInformation,
+    UnitOfTime,
 )
 from . import StarlinkUpdateCoordinator
+from .breaker import BREAKER_STATES, CircuitBreaker
+from .entity import StarlinkEntity, StarlinkEntityDescription, async_add_new_fields
+from .rollup import ROLLUP_PERIODS, ROLLUP_STATS, rollup_key
+from .streaming import STREAM_QUANTILES, STREAM_WINDOWS, stream_key
 
-from .const import ATTR_IDENTIFIERS, ATTR_MANUFACTURER, ATTR_MODEL, DOMAIN, COORDINATOR
+from .const import ATTR_IDENTIFIERS, ATTR_MANUFACTURER, ATTR_MODEL, DOMAIN, COORDINATOR, COORDINATOR_HISTORY, COORDINATOR_SLOW, SPACEX_API
 
 _LOGGER = logging.getLogger(__name__)
 
+SENSORS = (
+    StarlinkEntityDescription(
+        kind="starlink_software_version",
+        name="Software Version",
+        key="software_version",
+        coordinator=COORDINATOR_SLOW,
+    ),
+    StarlinkEntityDescription(
+        kind="starlink_state",
+        name="State",
+        key="state",
+    ),
+    StarlinkEntityDescription(
+        kind="starlink_uptime",
+        name="Uptime",
+        key="uptime",
+        icon="mdi:timer-outline",
+        convert=int,
+        unit=UnitOfTime.SECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    ),
+    StarlinkEntityDescription(
+        kind="starlink_pop_ping_drop_rate",
+        name="Ping Drop Rate",
+        key="pop_ping_drop_rate",
+        scale=100,
+        precision=2,
+        unit=PERCENTAGE,
+        state_class=SensorStateClass.MEASUREMENT,
+        deadband=0.001,
+    ),
+    StarlinkEntityDescription(
+        kind="starlink_downlink_throughput_mbps",
+        name="Downlink Throughput",
+        key="downlink_throughput_bps",
+        scale=1e-6,
+        precision=2,
+        unit=UnitOfDataRate.MEGABITS_PER_SECOND,
+        device_class=SensorDeviceClass.DATA_RATE,
+        state_class=SensorStateClass.MEASUREMENT,
+        deadband=100000,
+    ),
+    StarlinkEntityDescription(
+        kind="starlink_uplink_throughput_mbps",
+        name="Uplink Throughput",
+        key="uplink_throughput_bps",
+        scale=1e-6,
+        precision=2,
+        unit=UnitOfDataRate.MEGABITS_PER_SECOND,
+        device_class=SensorDeviceClass.DATA_RATE,
+        state_class=SensorStateClass.MEASUREMENT,
+        deadband=100000,
+    ),
+    StarlinkEntityDescription(
+        kind="starlink_pop_ping_latency_ms",
+        name="Ping Latency",
+        key="pop_ping_latency_ms",
+        precision=2,
+        unit=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        deadband=1,
+    ),
+    StarlinkEntityDescription(
+        kind="starlink_latitude",
+        name="Dish Latitude",
+        key="latitude",
+        precision=4,
+        unit=CONF_LATITUDE,
+        coordinator=COORDINATOR_SLOW,
+    ),
+    StarlinkEntityDescription(
+        kind="starlink_longitude",
+        name="Dish Longitude",
+        key="longitude",
+        precision=4,
+        unit=CONF_LONGITUDE,
+        coordinator=COORDINATOR_SLOW,
+    ),
+    StarlinkEntityDescription(
+        kind="starlink_altitude",
+        name="Dish Altitude",
+        key="altitude",
+        precision=4,
+        unit=CONF_ELEVATION,
+        coordinator=COORDINATOR_SLOW,
+    ),
+    # History stats over the samples since the previous history refresh.
+    StarlinkEntityDescription(
+        kind="starlink_history_samples",
+        name="History Samples",
+        key="samples",
+        icon="mdi:counter",
+        coordinator=COORDINATOR_HISTORY,
+    ),
+    StarlinkEntityDescription(
+        kind="starlink_history_ping_drop_time",
+        name="Dropped Ping Time",
+        key="total_ping_drop",
+        icon="mdi:timer-alert-outline",
+        precision=2,
+        unit=UnitOfTime.SECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        coordinator=COORDINATOR_HISTORY,
+    ),
+    StarlinkEntityDescription(
+        kind="starlink_history_full_ping_drop_samples",
+        name="Full Ping Drop Samples",
+        key="count_full_ping_drop",
+        icon="mdi:counter",
+        state_class=SensorStateClass.MEASUREMENT,
+        coordinator=COORDINATOR_HISTORY,
+    ),
+    StarlinkEntityDescription(
+        kind="starlink_history_drop_runs_seconds",
+        name="Ping Drop Runs Under A Minute",
+        key="run_seconds",
+        icon="mdi:timer-alert-outline",
+        convert=sum,
+        unit=UnitOfTime.SECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        coordinator=COORDINATOR_HISTORY,
+    ),
+    StarlinkEntityDescription(
+        kind="starlink_history_drop_runs_minutes",
+        name="Ping Drop Runs Over A Minute",
+        key="run_minutes",
+        icon="mdi:timer-alert-outline",
+        convert=sum,
+        unit=UnitOfTime.SECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        coordinator=COORDINATOR_HISTORY,
+    ),
+    StarlinkEntityDescription(
+        kind="starlink_history_mean_latency",
+        name="Mean Ping Latency",
+        key="mean_all_ping_latency",
+        precision=2,
+        unit=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        coordinator=COORDINATOR_HISTORY,
+    ),
+    StarlinkEntityDescription(
+        kind="starlink_history_median_latency",
+        name="Median Ping Latency",
+        key="deciles_all_ping_latency",
+        index=5,
+        precision=2,
+        unit=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        coordinator=COORDINATOR_HISTORY,
+    ),
+    StarlinkEntityDescription(
+        kind="starlink_history_p90_latency",
+        name="90th Percentile Ping Latency",
+        key="deciles_all_ping_latency",
+        index=9,
+        precision=2,
+        unit=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        coordinator=COORDINATOR_HISTORY,
+    ),
+    StarlinkEntityDescription(
+        kind="starlink_history_latency_stdev",
+        name="Ping Latency Standard Deviation",
+        key="stdev_full_ping_latency",
+        precision=2,
+        unit=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        coordinator=COORDINATOR_HISTORY,
+    ),
+    StarlinkEntityDescription(
+        kind="starlink_history_download_usage",
+        name="Download Usage",
+        key="download_usage",
+        icon="mdi:download",
+        unit=UnitOfInformation.BYTES,
+        device_class=SensorDeviceClass.DATA_SIZE,
+        coordinator=COORDINATOR_HISTORY,
+    ),
+    StarlinkEntityDescription(
+        kind="starlink_history_upload_usage",
+        name="Upload Usage",
+        key="upload_usage",
+        icon="mdi:upload",
+        unit=UnitOfInformation.BYTES,
+        device_class=SensorDeviceClass.DATA_SIZE,
+        coordinator=COORDINATOR_HISTORY,
+    ),
+)
 
-async def async_setup_entry(hass, entry, async_add_entities):
-    """Set up the sensor platforms."""
-
-    coordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
-    sensors = []
-
-    sensors.append(
-        StarlinkSensor(
-            coordinator,
-            "Software Version",
-            "starlink_software_version",
-            "mdi:information-outline",
-            "starlinkstats",
-        )
+# Rollups of the per-second history, by bulk field: name, scale, unit and
+# device class. Only the 15 minute rollups are enabled by default.
+ROLLUP_FIELDS = {
+    "pop_ping_latency_ms": ("Ping Latency", 1, UnitOfTime.MILLISECONDS, SensorDeviceClass.DURATION),
+    "downlink_throughput_bps": (
+        "Downlink Throughput", 1e-6, UnitOfDataRate.MEGABITS_PER_SECOND,
+        SensorDeviceClass.DATA_RATE),
+    "uplink_throughput_bps": (
+        "Uplink Throughput", 1e-6, UnitOfDataRate.MEGABITS_PER_SECOND,
+        SensorDeviceClass.DATA_RATE),
+    "pop_ping_drop_rate": ("Ping Drop Rate", 100, PERCENTAGE, None),
+}
+ROLLUP_STAT_NAMES = {"min": "Min", "max": "Max", "mean": "Mean", "p95": "95th Percentile"}
+
+ROLLUP_SENSORS = tuple(
+    StarlinkEntityDescription(
+        kind=f"starlink_rollup_{rollup_key(field, period, stat)}",
+        name=f"{name} {label} {ROLLUP_STAT_NAMES[stat]}",
+        key=rollup_key(field, period, stat),
+        icon="mdi:chart-box-outline",
+        scale=scale,
+        precision=2,
+        unit=unit,
+        device_class=device_class,
+        state_class=SensorStateClass.MEASUREMENT,
+        coordinator=COORDINATOR_HISTORY,
+        enabled_default=period == 900,
     )
+    for field, (name, scale, unit, device_class) in ROLLUP_FIELDS.items()
+    for period, label in ROLLUP_PERIODS.items()
+    for stat in ROLLUP_STATS
+)
 
-    sensors.append(
-        StarlinkSensor(
-            coordinator,
-            "State",
-            "starlink_state",
-            "mdi:information-outline",
-            "starlinkstats",
-        )
+# Rolling quantiles and moving averages of the polled values, by status
+# field, with the same names and units as the rollups. Only the 5 minute ones
+# are enabled by default.
+STREAM_DEADBANDS = {
+    "pop_ping_latency_ms": 1,
+    "downlink_throughput_bps": 100000,
+    "uplink_throughput_bps": 100000,
+}
+STREAM_STAT_NAMES = {"p50": "Median", "p95": "95th Percentile", "p99": "99th Percentile"}
+
+
+def _stream_description(field, window, stat):
+    name, scale, unit, device_class = ROLLUP_FIELDS[field]
+    label = STREAM_WINDOWS[window]
+    return StarlinkEntityDescription(
+        kind=f"starlink_stream_{stream_key(field, window, stat)}",
+        name=(f"{name} {label} Average" if stat == "ewma"
+              else f"{name} Rolling {label} {STREAM_STAT_NAMES[stat]}"),
+        key=stream_key(field, window, stat),
+        icon="mdi:chart-bell-curve-cumulative",
+        scale=scale,
+        precision=2,
+        unit=unit,
+        device_class=device_class,
+        state_class=SensorStateClass.MEASUREMENT,
+        deadband=STREAM_DEADBANDS[field],
+        enabled_default=window == 300,
     )
 
-    sensors.append(
-        StarlinkSensor(
-            coordinator,
-            "Uptime",
-            "starlink_uptime",
-            "mdi:timer-outline",
-            "starlinkstats",
-        )
-    )
 
-    sensors.append(
-        StarlinkSensor(
-            coordinator,
-            "Ping Drop Rate",
-            "starlink_pop_ping_drop_rate",
-            "mdi:information-outline",
-            "starlinkstats",
-        )
-    )
+BREAKER_SENSOR = StarlinkEntityDescription(
+    kind="starlink_breaker",
+    name="Connection Breaker",
+    key="breaker",
+    icon="mdi:electric-switch",
+    device_class=SensorDeviceClass.ENUM,
+)
 
-    sensors.append(
-        StarlinkSensor(
-            coordinator,
-            "Downlink Throughput",
-            "starlink_downlink_throughput_mbps",
-            "mdi:information-outline",
-            "starlinkstats",
-        )
-    )
 
-    sensors.append(
-        StarlinkSensor(
-            coordinator,
-            "Uplink Throughput",
-            "starlink_uplink_throughput_mbps",
-            "mdi:information-outline",
-            "starlinkstats",
-        )
-    )
+STREAM_SENSORS = tuple(
+    _stream_description(field, window, stat)
+    for field in STREAM_DEADBANDS
+    for window in STREAM_WINDOWS
+    for stat in (*STREAM_QUANTILES.values(), "ewma")
+)
 
-    sensors.append(
-        StarlinkSensor(
-            coordinator,
-            "Ping Latency",
-            "starlink_pop_ping_latency_ms",
-            "mdi:information-outline",
-            "starlinkstats",
-        )
-    )
 
-    sensors.append(
-        StarlinkSensor(
-            coordinator,
-            "Dish Latitude",
-            "starlink_latitude",
-            "mdi:information-outline",
-            "starlinkstats",
-        )
-    )
+async def async_setup_entry(hass, entry, async_add_entities):
+    """Set up the sensor platforms."""
 
-    sensors.append(
-        StarlinkSensor(
-            coordinator,
-            "Dish Longitude",
-            "starlink_longitude",
-            "mdi:information-outline",
-            "starlinkstats",
-        )
-    )
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    coordinator = entry_data[COORDINATOR]
 
-    sensors.append(
-        StarlinkSensor(
-            coordinator,
-            "Dish Altitude",
-            "starlink_altitude",
-            "mdi:information-outline",
-            "starlinkstats",
-        )
-    )
-    async_add_entities(sensors)
+    def _entities(descriptions):
+        return [
+            StarlinkSensor(
+                entry_data[description.coordinator],
+                description,
+                entry.unique_id,
+            )
+            for description in descriptions
+        ]
 
+    async_add_entities(_entities(SENSORS + ROLLUP_SENSORS + STREAM_SENSORS))
+    async_add_entities([
+        StarlinkBreakerSensor(coordinator, entry_data[SPACEX_API].breaker, entry.unique_id)
+    ])
+    async_add_new_fields(
+        hass, entry, async_add_entities, StarlinkSensor, SENSORS + STREAM_SENSORS, binary=False)
 
-class StarlinkSensor(CoordinatorEntity):
-    """Defines a Starlink Binary sensor."""
+
+class StarlinkSensor(StarlinkEntity, SensorEntity):
+    """Defines a Starlink sensor."""
 
     def __init__(
         self,
         coordinator: StarlinkUpdateCoordinator,
-        name: str,
-        entity_id: str,
-        icon: str,
-        device_identifier: str,
+        description: StarlinkEntityDescription,
+        dish_id: str,
     ):
         """Initialize Entities."""
 
-        super().__init__(coordinator=coordinator)
+        super().__init__(coordinator, description, dish_id)
 
-        self._name = name
-        self._unique_id = f"starlink_{entity_id}"
-        self._state = None
-        self._icon = icon
-        self._kind = entity_id
-        self._device_identifier = device_identifier
-        self._unit_of_measure = None
+        self._device_identifier = f"{dish_id}_stats"
+        self._attr_native_unit_of_measurement = description.unit
+        self._attr_state_class = description.state_class
         self.attrs = {}
 
-        if self._kind == "starlink_downlink_throughput_mbps":
-            self._unit_of_measure = DATA_RATE_MEGABITS_PER_SECOND
-
-        elif self._kind == "starlink_uplink_throughput_mbps":
-            self._unit_of_measure = DATA_RATE_MEGABITS_PER_SECOND
-
-        elif self._kind == "starlink_pop_ping_drop_rate":
-            self._unit_of_measure = PERCENTAGE
-
-        elif self._kind == "starlink_pop_ping_latency_ms":
-            self._unit_of_measure = TIME_MILLISECONDS
-
-        elif self._kind == "starlink_uptime":
-            self._unit_of_measure = TIME_SECONDS
-
-        elif self._kind == "starlink_latitude":
-            self._unit_of_measure = CONF_LATITUDE
-
-        elif self._kind == "starlink_longitude":
-            self._unit_of_measure = CONF_LONGITUDE
-
-        elif self._kind == "starlink_altitude":
-            self._unit_of_measure = CONF_ELEVATION
-
-    @property
-    def unique_id(self):
-        """Return the unique Home Assistant friendly identifier for this entity."""
-        return self._unique_id
-
-    @property
-    def name(self):
-        """Return the friendly name of this entity."""
-        return self._name
-
-    @property
-    def icon(self):
-        """Return the icon for this entity."""
-        return self._icon
-
-    @property
-    def unit_of_measurement(self):
-        """Return the unit of measurement for this entity."""
-        return self._unit_of_measure
-
     @property
     def extra_state_attributes(self):
         """Return the attributes."""
@@ -215,58 +361,49 @@ class StarlinkSensor(CoordinatorEntity):
         }
 
     @property
-    def state(self):
+    def native_value(self):
+        """Return the state."""
+        return self._value(self.coordinator.data)
+
+
+class StarlinkBreakerSensor(StarlinkSensor):
+    """State of the circuit breaker guarding the polls of a dish.
+
+    Unlike the other sensors it stays available while the dish is
+    unreachable, since that is when it has something to say.
+    """
+
+    def __init__(
+        self,
+        coordinator: StarlinkUpdateCoordinator,
+        breaker: CircuitBreaker,
+        dish_id: str,
+    ):
+        """Initialize Entities."""
+
+        super().__init__(coordinator, BREAKER_SENSOR, dish_id)
+        self._breaker = breaker
+        self._attr_options = BREAKER_STATES
+
+    @property
+    def available(self) -> bool:
+        """Return if entity is available."""
+        return True
+
+    @property
+    def extra_state_attributes(self):
+        """Return the attributes."""
+        return {
+            "consecutive_failures": self._breaker.failures,
+            "probe_interval": self._breaker.probe_interval,
+        }
+
+    @property
+    def native_value(self):
         """Return the state."""
-        coordinator_data = self.coordinator.data
-
-        if self._kind == "starlink_software_version":
-            self._state = coordinator_data["software_version"]
-
-        elif self._kind == "starlink_state":
-            self._state = coordinator_data["state"]
-
-        elif self._kind == "starlink_downlink_throughput_mbps":
-            self._state = round(
-                (float(coordinator_data["downlink_throughput_bps"])/1000000), 2)
-            self._unit_of_measure = DATA_RATE_MEGABITS_PER_SECOND
-
-        elif self._kind == "starlink_uplink_throughput_mbps":
-            self._state = round(
-                (float(coordinator_data["uplink_throughput_bps"])/1000000), 2)
-            self._unit_of_measure = DATA_RATE_MEGABITS_PER_SECOND
-        elif self._kind == "starlink_pop_ping_drop_rate":
-            self._state = round(
-                (float(coordinator_data["pop_ping_drop_rate"])*100), 2)
-            self._unit_of_measure = PERCENTAGE
-        elif self._kind == "starlink_pop_ping_latency_ms":
-            self._state = round(
-                float(coordinator_data["pop_ping_latency_ms"]), 2)
-            self._unit_of_measure = TIME_MILLISECONDS
-        elif self._kind == "starlink_uptime":
-            self._state = int(coordinator_data["uptime"])
-            self._unit_of_measure = TIME_SECONDS
-        elif self._kind == "starlink_latitude":
-            self._state = round(
-                float(coordinator_data["latitude"]), 4)
-            self._unit_of_measure = CONF_LATITUDE
-        elif self._kind == "starlink_longitude":
-            self._state = round(
-                float(coordinator_data["longitude"]), 4)
-            self._unit_of_measure = CONF_LONGITUDE
-        elif self._kind == "starlink_altitude":
-            self._state = round(
-                float(coordinator_data["altitude"]), 4)
-            self._unit_of_measure = CONF_ELEVATION
-
-        return self._state
-
-    async def async_update(self):
-        """Update Starlink Binary Sensor Entity."""
-        await self.coordinator.async_request_refresh()
-        _LOGGER.debug("Updating state of the sensors.")
+        return self._breaker.state
 
     async def async_added_to_hass(self):
-        """Subscribe to updates."""
-        self.async_on_remove(
-            self.coordinator.async_add_listener(self.async_write_ha_state)
-        )
+        """Subscribe to breaker changes rather than to a payload key."""
+        await super(StarlinkEntity, self).async_added_to_hass()
+        self.async_on_remove(self._breaker.async_add_listener(self.async_write_ha_state))
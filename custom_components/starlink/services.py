@@ -0,0 +1,72 @@
+"""Services of the Starlink integration."""
+import math
+
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    ATTR_CONFIG_ENTRY_ID,
+    ATTR_END,
+    ATTR_START,
+    DOMAIN,
+    HISTORY_SERVICE_MAX_SPAN,
+    SERVICE_GET_HISTORY,
+    SPACEX_API,
+)
+
+GET_HISTORY_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+    vol.Required(ATTR_START): cv.datetime,
+    vol.Optional(ATTR_END): cv.datetime,
+})
+
+
+def _api(hass: HomeAssistant, entry_id: str = None):
+    """Return the StarlinkClass of a loaded entry, the only one if entry_id is None."""
+    loaded = {
+        key: value[SPACEX_API] for key, value in hass.data[DOMAIN].items()
+        if isinstance(value, dict) and SPACEX_API in value
+    }
+    if entry_id is not None:
+        if entry_id not in loaded:
+            raise HomeAssistantError(f"No loaded Starlink dish with config entry {entry_id}")
+        return loaded[entry_id]
+    if len(loaded) != 1:
+        raise HomeAssistantError(
+            f"{len(loaded)} Starlink dishes are loaded; pass {ATTR_CONFIG_ENTRY_ID}")
+    return next(iter(loaded.values()))
+
+
+def _response(timestamps, columns) -> dict:
+    """Return stored samples as JSON, with samples the dish did not report as null."""
+    response = {"timestamps": timestamps.tolist()}
+    for field, values in columns.items():
+        response[field] = [None if math.isnan(value) else value for value in values.tolist()]
+    return response
+
+
+def async_setup_services(hass: HomeAssistant):
+    """Register the services, once for all dishes."""
+
+    async def async_get_history(call: ServiceCall) -> dict:
+        """Return the per-second history samples stored for a dish."""
+        api = _api(hass, call.data.get(ATTR_CONFIG_ENTRY_ID))
+        start = int(dt_util.as_utc(call.data[ATTR_START]).timestamp())
+        end = call.data.get(ATTR_END)
+        end = int(dt_util.as_utc(end).timestamp()) if end else int(dt_util.utcnow().timestamp())
+        if not 0 < end - start <= HISTORY_SERVICE_MAX_SPAN:
+            raise HomeAssistantError(
+                f"{ATTR_END} must be after {ATTR_START} and at most "
+                f"{HISTORY_SERVICE_MAX_SPAN} seconds later")
+        stored = await api.get_stored_history(start, end)
+        if stored is None:
+            raise HomeAssistantError("History samples are not stored for this dish")
+        return await hass.async_add_executor_job(_response, *stored)
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_GET_HISTORY, async_get_history,
+        schema=GET_HISTORY_SCHEMA, supports_response=SupportsResponse.ONLY)
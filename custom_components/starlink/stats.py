@@ -0,0 +1,234 @@
+"""Vectorized computation of Starlink history statistics.
+
+history_stats here is a drop-in replacement for starlink_grpc.history_stats
+that does the per-sample work with numpy instead of Python loops, so it is
+cheap enough to run on every poll. It returns the same groups with the same
+keys; results agree to within floating point summation order.
+"""
+import math
+from typing import Optional
+
+import grpc
+import numpy as np
+
+import starlink_grpc
+
+LATENCY_BUCKETS = 15
+LOAD_BUCKET_BASE = 500000
+
+
+def sample_indexes(history, parse_samples: int, start: Optional[int] = None):
+    """Return sample indexes (oldest first), sample count and end counter.
+
+    Mirrors the sample range selection of starlink_grpc.history_stats.
+    """
+    try:
+        current = int(history.current)
+        samples = len(history.pop_ping_drop_rate)
+    except (AttributeError, TypeError):
+        return np.arange(0), 0, None
+
+    unwrapped = hasattr(history, "unwrapped")
+    if not unwrapped:
+        samples = min(samples, current)
+    if parse_samples < 0 or samples < parse_samples:
+        parse_samples = samples
+    if start is not None and start > current:
+        start = None
+    if start is None or start < current - parse_samples:
+        start = current - parse_samples
+    if start == current:
+        return np.arange(0), 0, current
+
+    count = current - start
+    if unwrapped:
+        return np.arange(samples - count, samples), count, current
+    return np.arange(start, current) % samples, count, current
+
+
+def _column(history, field: str, indexes, default: float):
+    """Return field at indexes as floats, with default where it is missing."""
+    values = getattr(history, field, None)
+    if values is None:
+        return np.full(len(indexes), default)
+    try:
+        values = np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        return np.full(len(indexes), default)
+    if len(indexes) and indexes.max() >= len(values):
+        result = np.full(len(indexes), default)
+        valid = indexes < len(values)
+        result[valid] = values[indexes[valid]]
+        return result
+    return values[indexes]
+
+
+def _weighted_mean_and_quantiles(values, weights, n: int):
+    """Vectorized form of the quantile walk in starlink_grpc.history_stats.
+
+    values must be sorted. Like the original, samples past the last quantile
+    boundary add to the mean unweighted.
+    """
+    if not len(values):
+        return None, [None] * (n + 1)
+    cumulative = np.cumsum(weights)
+    total = cumulative[-1]
+    boundaries = total * np.arange(n) / n
+    picks = np.minimum(np.searchsorted(cumulative, boundaries, side="left"), len(values) - 1)
+    consumed = picks[-1] + 1
+    accum = np.dot(values[:consumed], weights[:consumed]) + values[consumed:].sum()
+    quantiles = values[picks].tolist()
+    quantiles.append(float(values[-1]))
+    return float(accum / total), quantiles
+
+
+def _run_lengths(full):
+    """Return initial fragment, final fragment and the complete runs in between."""
+    count = len(full)
+    if not full.all():
+        edges = np.diff(np.concatenate(([0], full.view(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        lengths = np.flatnonzero(edges == -1) - starts
+        init = 0
+        final = 0
+        if len(starts) and starts[0] == 0:
+            init = int(lengths[0])
+            starts, lengths = starts[1:], lengths[1:]
+        if len(starts) and starts[-1] + lengths[-1] == count:
+            final = int(lengths[-1])
+            lengths = lengths[:-1]
+        return init, final, lengths
+    # One run covering the whole range (or no samples) is reported as the
+    # initial fragment only.
+    return count, 0, np.arange(0)
+
+
+def history_stats(parse_samples: int,
+                  start: Optional[int] = None,
+                  verbose: bool = False,
+                  context: Optional[starlink_grpc.ChannelContext] = None,
+                  history=None):
+    """Fetch, parse, and compute ping and usage stats.
+
+    Takes the same arguments and returns the same tuple of dicts as
+    starlink_grpc.history_stats.
+
+    Raises:
+        GrpcError: Failed getting history info from the Starlink user
+            terminal.
+    """
+    if history is None:
+        try:
+            history = starlink_grpc.get_history(context)
+        except (AttributeError, ValueError, grpc.RpcError) as e:
+            raise starlink_grpc.GrpcError(e) from e
+
+    indexes, parsed_samples, current = sample_indexes(history, parse_samples, start)
+    if verbose:
+        print("Parsed samples:        " + str(parsed_samples))
+
+    drop = np.minimum(_column(history, "pop_ping_drop_rate", indexes, 0.0), 1.0)
+    down = _column(history, "downlink_throughput_bps", indexes, 0.0)
+    up = _column(history, "uplink_throughput_bps", indexes, 0.0)
+    rtt = _column(history, "pop_ping_latency_ms", indexes, 0.0)
+    power = _column(history, "power_in", indexes, math.nan)
+
+    full = drop >= 1
+    init_run, final_run, runs = _run_lengths(full)
+    second_runs = np.zeros(60, dtype=np.int64)
+    minute_runs = np.zeros(60, dtype=np.int64)
+    short = runs <= 60
+    np.add.at(second_runs, runs[short] - 1, runs[short])
+    long_runs = runs[~short]
+    np.add.at(minute_runs, np.minimum((long_runs - 1) // 60 - 1, 59), long_runs)
+
+    # Latency of samples with no ping drop at all, bucketed by load.
+    clear = drop == 0.0
+    rtt_full = rtt[clear]
+    load = (down + up)[clear]
+    buckets = np.zeros(len(load), dtype=np.int64)
+    loaded = load > LOAD_BUCKET_BASE
+    buckets[loaded] = np.minimum(
+        LATENCY_BUCKETS - 1, np.floor(np.log2(load[loaded] / LOAD_BUCKET_BASE))).astype(np.int64)
+    order = np.lexsort((rtt_full, buckets))
+    sorted_rtt = rtt_full[order]
+    bucket_samples = np.bincount(buckets, minlength=LATENCY_BUCKETS)
+    offsets = np.concatenate(([0], np.cumsum(bucket_samples)[:-1]))
+    bucket_min = []
+    bucket_median = []
+    bucket_max = []
+    for offset, size in zip(offsets.tolist(), bucket_samples.tolist()):
+        if size:
+            bucket_min.append(float(sorted_rtt[offset]))
+            bucket_median.append(
+                float(sorted_rtt[offset + size // 2]) if size % 2
+                else float((sorted_rtt[offset + size // 2 - 1] + sorted_rtt[offset + size // 2]) / 2))
+            bucket_max.append(float(sorted_rtt[offset + size - 1]))
+        else:
+            bucket_min.append(None)
+            bucket_median.append(None)
+            bucket_max.append(None)
+
+    # Latency of every sample with any pings returned, weighted by the
+    # fraction returned.
+    partial = drop < 1.0
+    order = np.argsort(rtt[partial], kind="stable")
+    wmean_all, wdeciles_all = _weighted_mean_and_quantiles(
+        rtt[partial][order], (1.0 - drop[partial])[order], 10)
+
+    # Unweighted deciles only need the order statistics they pick, so
+    # partition around those instead of sorting everything.
+    count_full = len(rtt_full)
+    if count_full:
+        picks = np.maximum(np.ceil(count_full * np.arange(10) / 10).astype(np.int64) - 1, 0)
+        kth = np.unique(np.append(picks, count_full - 1))
+        partitioned = np.partition(rtt_full, kth)
+        deciles_full = partitioned[picks].tolist()
+        deciles_full.append(float(partitioned[count_full - 1]))
+        mean_full = float(rtt_full.mean())
+        stdev_full = float(rtt_full.std())
+    else:
+        mean_full, deciles_full, stdev_full = None, [None] * 11, None
+
+    reported = ~np.isnan(power)
+    power_reported = power[reported]
+    energy = float(power_reported.sum())
+
+    return {
+        "samples": parsed_samples,
+        "end_counter": current,
+    }, {
+        "total_ping_drop": float(drop.sum()),
+        "count_full_ping_drop": int(full.sum()),
+        "count_obstructed": 0,
+        "total_obstructed_ping_drop": 0.0,
+        "count_full_obstructed_ping_drop": 0,
+        "count_unscheduled": 0,
+        "total_unscheduled_ping_drop": 0.0,
+        "count_full_unscheduled_ping_drop": 0,
+    }, {
+        "init_run_fragment": init_run,
+        "final_run_fragment": final_run,
+        "run_seconds[1,]": second_runs.tolist(),
+        "run_minutes[1,]": minute_runs.tolist(),
+    }, {
+        "mean_all_ping_latency": wmean_all,
+        "deciles_all_ping_latency[]": wdeciles_all,
+        "mean_full_ping_latency": mean_full,
+        "deciles_full_ping_latency[]": deciles_full,
+        "stdev_full_ping_latency": stdev_full,
+    }, {
+        "load_bucket_samples[]": bucket_samples.tolist(),
+        "load_bucket_min_latency[]": bucket_min,
+        "load_bucket_median_latency[]": bucket_median,
+        "load_bucket_max_latency[]": bucket_max,
+    }, {
+        "download_usage": int(round(float(down.sum()) / 8)),
+        "upload_usage": int(round(float(up.sum()) / 8)),
+    }, {
+        "latest_power": float(power_reported[-1]) if len(power_reported) else None,
+        "mean_power": None if parsed_samples == 0 else energy / parsed_samples,
+        "min_power": float(power_reported.min()) if len(power_reported) else None,
+        "max_power": float(power_reported.max()) if len(power_reported) else None,
+        "total_energy": energy / 3600 / 1000,
+    }
@@ -0,0 +1,216 @@
+"""On-disk store of per-second bulk history samples."""
+from dataclasses import asdict, dataclass
+import json
+import logging
+import math
+import os
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .ring import BULK_FIELDS
+
+_LOGGER = logging.getLogger(__name__)
+
+FIELDS = tuple(BULK_FIELDS)
+# An hour of samples per segment file, and a week of segments kept.
+SEGMENT_SAMPLES = 3600
+RETENTION_SECONDS = 7 * 24 * 3600
+INDEX_FILE = "index.json"
+# Seconds a re-established time base may differ from the stored one for the
+# same samples, as get_bulk_data allows.
+TIME_DRIFT = 2
+
+
+@dataclass
+class Segment:
+    """A run of consecutive samples stored in one segment file.
+
+    Sample i of the segment has dish counter counter + i and was recorded at
+    timestamp + i seconds (UTC epoch).
+    """
+
+    name: str
+    counter: int
+    timestamp: int
+    count: int = 0
+
+    @property
+    def end(self) -> int:
+        """Timestamp one past the newest sample."""
+        return self.timestamp + self.count
+
+
+class BulkHistoryStore:
+    """Append-only columnar store of bulk history, read through memory maps.
+
+    Samples go into fixed-size segment files, each holding one float64 column
+    per field for up to segment_samples consecutive samples. A new segment is
+    started when the current one is full or when the samples being appended
+    do not follow on from it in both counter and time, such as after a dish
+    reboot or a lost time base. Appended samples the newest segment already
+    holds are skipped, so the first poll after a restart, which passes the
+    whole history buffer again, does not store it twice. A small JSON index
+    records each segment's starting counter, starting timestamp and sample
+    count, so range reads only map the segments they cover. Only the
+    segment being written to stays mapped between calls. Segments older
+    than retention seconds are deleted.
+
+    Nothing is read from or written to disk until the first append or read,
+    so the store can be created from the event loop.
+    """
+
+    def __init__(self, path: str, segment_samples: int = SEGMENT_SAMPLES,
+                 retention: int = RETENTION_SECONDS):
+        self.path = path
+        self.segment_samples = segment_samples
+        self.retention = retention
+        self.segments: List[Segment] = []
+        self._maps: Dict[str, np.memmap] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def append(self, bulk: dict, samples: int, timestamp: int, counter: int):
+        """Append samples as passed to a get_bulk_data add_bulk callback.
+
+        Args:
+            bulk: Sequences of sample values, keyed by bulk field name.
+            samples: Number of samples in each sequence.
+            timestamp: UTC epoch time of the first sample.
+            counter: Dish counter of the first sample.
+
+        Raises:
+            OSError: Writing the segment or index files failed.
+        """
+        with self._lock:
+            self._load()
+            pos = self._held(samples, timestamp, counter)
+            if pos == samples:
+                return
+            while pos < samples:
+                segment = self.segments[-1] if self.segments else None
+                if (segment is None or segment.count == self.segment_samples
+                        or segment.counter + segment.count != counter + pos
+                        or segment.end != timestamp + pos):
+                    segment = self._new_segment(counter + pos, timestamp + pos)
+                count = min(samples - pos, self.segment_samples - segment.count)
+                data = self._map(segment, writable=True)
+                for row, field in enumerate(FIELDS):
+                    values = bulk.get(field)
+                    data[row, segment.count:segment.count + count] = \
+                        math.nan if values is None else values[pos:pos + count]
+                data.flush()
+                segment.count += count
+                pos += count
+            self._expire(timestamp + samples - self.retention)
+            self._save_index()
+
+    def read(self, start: int, end: int) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Return the samples recorded from timestamp start up to end.
+
+        Returns:
+            A tuple of the sample timestamps and a dict of the sample values
+            keyed by bulk field name, in the order they were stored. Values
+            the dish did not report are NaN. When the time base was reset,
+            samples from either side of the reset may overlap in time.
+        """
+        with self._lock:
+            self._load()
+            # Only the index is scanned; segment data outside the range is
+            # never mapped.
+            covered = [
+                segment for segment in self.segments
+                if segment.timestamp < end and segment.end > start
+            ]
+
+            timestamps = []
+            columns = {field: [] for field in FIELDS}
+            for segment in covered:
+                first = max(start - segment.timestamp, 0)
+                stop = min(end - segment.timestamp, segment.count)
+                data = self._map(segment)
+                timestamps.append(np.arange(segment.timestamp + first, segment.timestamp + stop))
+                for row, field in enumerate(FIELDS):
+                    columns[field].append(data[row, first:stop])
+                if segment is not self.segments[-1]:
+                    # Sealed segments are rarely read again. Their map is
+                    # closed once the slices above are copied out below.
+                    self._maps.pop(segment.name, None)
+        if not covered:
+            return np.arange(0), {field: np.zeros(0) for field in FIELDS}
+        return np.concatenate(timestamps), {
+            field: np.concatenate(parts) for field, parts in columns.items()
+        }
+
+    def _held(self, samples: int, timestamp: int, counter: int) -> int:
+        """Return how many leading samples of an append are already stored.
+
+        Those are the samples up to the last counter of the newest segment,
+        if their timestamps agree with the stored ones to within TIME_DRIFT.
+        Samples after a counter reset or a jump in time are always new.
+        """
+        if not self.segments:
+            return 0
+        segment = self.segments[-1]
+        held = segment.counter + segment.count - counter
+        stored_at = segment.timestamp + counter - segment.counter
+        if held <= 0 or abs(stored_at - timestamp) > TIME_DRIFT:
+            return 0
+        return min(held, samples)
+
+    def _load(self):
+        if self._loaded:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        try:
+            with open(os.path.join(self.path, INDEX_FILE), encoding="utf-8") as index:
+                self.segments = [
+                    Segment(**segment) for segment in json.load(index)["segments"]
+                    if os.path.exists(os.path.join(self.path, segment["name"]))
+                ]
+        except FileNotFoundError:
+            self.segments = []
+        except (ValueError, KeyError, TypeError) as error:
+            _LOGGER.warning("Discarding unreadable history index in %s: %s", self.path, error)
+            self.segments = []
+        self._loaded = True
+
+    def _save_index(self):
+        index_path = os.path.join(self.path, INDEX_FILE)
+        with open(index_path + ".tmp", "w", encoding="utf-8") as index:
+            json.dump({"segments": [asdict(segment) for segment in self.segments]}, index)
+        os.replace(index_path + ".tmp", index_path)
+
+    def _new_segment(self, counter: int, timestamp: int) -> Segment:
+        segment = Segment(f"{timestamp}-{counter}.seg", counter, timestamp)
+        # Seal the previous segment's map; it is reopened read-only if read.
+        if self.segments:
+            self._maps.pop(self.segments[-1].name, None)
+        self.segments.append(segment)
+        return segment
+
+    def _map(self, segment: Segment, writable: bool = False) -> np.memmap:
+        data = self._maps.get(segment.name)
+        if data is None or (writable and data.mode == "r"):
+            filename = os.path.join(self.path, segment.name)
+            if writable:
+                mode = "r+" if os.path.exists(filename) else "w+"
+                data = np.memmap(filename, dtype=np.float64, mode=mode,
+                                 shape=(len(FIELDS), self.segment_samples))
+                if mode == "w+":
+                    data[:] = math.nan
+            else:
+                data = np.memmap(filename, dtype=np.float64, mode="r",
+                                 shape=(len(FIELDS), self.segment_samples))
+            self._maps[segment.name] = data
+        return data
+
+    def _expire(self, before: int):
+        while self.segments and self.segments[0].end <= before and len(self.segments) > 1:
+            segment = self.segments.pop(0)
+            self._maps.pop(segment.name, None)
+            try:
+                os.remove(os.path.join(self.path, segment.name))
+            except FileNotFoundError:
+                pass
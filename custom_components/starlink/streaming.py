@@ -0,0 +1,119 @@
+"""Rolling estimators over the polled status values."""
+from bisect import bisect_left, insort
+from collections import deque
+import math
+from typing import Dict, Iterable, Optional
+
+# Status fields tracked, window lengths in seconds with their labels, and
+# the quantiles estimated over each window.
+STREAM_FIELDS = (
+    "pop_ping_latency_ms",
+    "downlink_throughput_bps",
+    "uplink_throughput_bps",
+)
+STREAM_WINDOWS = {60: "1m", 300: "5m", 900: "15m"}
+STREAM_QUANTILES = {0.5: "p50", 0.95: "p95", 0.99: "p99"}
+
+
+def stream_key(field: str, window: int, stat: str) -> str:
+    """Return the payload key of one streaming statistic."""
+    return f"{field}_{stat}_{STREAM_WINDOWS[window]}"
+
+
+class WindowedQuantiles:
+    """Quantiles of the values added over the last window seconds.
+
+    Values are kept in arrival order, to expire them, and in sorted order, to
+    read any quantile exactly, interpolated as numpy.quantile does. Memory is
+    bounded by the values in one window, and by max_samples if given. Each
+    add shifts at most that many values.
+    """
+
+    def __init__(self, window: float, max_samples: Optional[int] = None):
+        self.window = window
+        self.max_samples = max_samples
+        self._arrivals = deque()
+        self._sorted = []
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def add(self, value: Optional[float], now: float):
+        """Fold in a value observed at monotonic time now; None only expires old ones."""
+        arrivals = self._arrivals
+        while arrivals and arrivals[0][0] <= now - self.window:
+            self._evict()
+        if value is None:
+            return
+        if self.max_samples and len(arrivals) >= self.max_samples:
+            self._evict()
+        arrivals.append((now, value))
+        insort(self._sorted, value)
+
+    def _evict(self):
+        """Drop the oldest value."""
+        del self._sorted[bisect_left(self._sorted, self._arrivals.popleft()[1])]
+
+    def value(self, quantile: float) -> Optional[float]:
+        """Return quantile of the values held, or None if there are none."""
+        values = self._sorted
+        if not values:
+            return None
+        position = quantile * (len(values) - 1)
+        below = math.floor(position)
+        if below + 1 == len(values):
+            return values[below]
+        return values[below] + (position - below) * (values[below + 1] - values[below])
+
+
+class Ewma:
+    """Exponentially weighted moving average with time constant window.
+
+    The weight of each new value depends on the time since the previous one,
+    so the average decays at the same rate however often it is polled.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self.value: Optional[float] = None
+        self._last: Optional[float] = None
+
+    def add(self, value: float, now: float):
+        """Fold in a value observed at monotonic time now."""
+        if self.value is None:
+            self.value = value
+        else:
+            weight = 1 - math.exp(-(now - self._last) / self.window)
+            self.value += weight * (value - self.value)
+        self._last = now
+
+
+class StreamingStats:
+    """Rolling quantiles and moving averages of selected status fields."""
+
+    def __init__(self, fields: Iterable[str] = STREAM_FIELDS,
+                 windows: Iterable[int] = tuple(STREAM_WINDOWS)):
+        # Polls come at most once a second, so a window holds at most window
+        # values; refreshes requested in between push out the oldest.
+        self._estimators = [
+            (field, window, WindowedQuantiles(window, max_samples=window), Ewma(window))
+            for field in fields for window in windows
+        ]
+
+    def update(self, data: dict, now: float) -> Dict[str, Optional[float]]:
+        """Fold in one status payload and return every statistic by key.
+
+        Fields that are missing, None or NaN in data are skipped.
+        """
+        values = {}
+        for field, window, quantiles, ewma in self._estimators:
+            value = data.get(field)
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                value = None
+            else:
+                ewma.add(value, now)
+            quantiles.add(value, now)
+            for quantile, stat in STREAM_QUANTILES.items():
+                values[stream_key(field, window, stat)] = quantiles.value(quantile)
+            values[stream_key(field, window, "ewma")] = ewma.value
+        return values
@@ -0,0 +1,89 @@
+"""Tests of the coordinators' listeners, polling and circuit breaker use."""
+from custom_components.starlink import StarlinkHistoryCoordinator, StarlinkUpdateCoordinator
+from custom_components.starlink.breaker import BusyError, CircuitBreaker
+
+
+class FakeApi:
+    """Answers get() with payload, or fails while payload is None."""
+
+    def __init__(self):
+        self.payload = None
+        self.breaker = CircuitBreaker(self.get_id, threshold=100)
+
+    async def get_id(self):
+        return "ut01"
+
+    async def get(self, location=True):
+        if self.payload is None:
+            raise ConnectionError("Dish unreachable")
+        return dict(self.payload)
+
+    async def get_history_stats(self):
+        if isinstance(self.payload, Exception):
+            raise self.payload
+        return dict(self.payload)
+
+
+async def test_deadband_listener_recovers_after_outage(hass):
+    api = FakeApi()
+    coordinator = StarlinkUpdateCoordinator(
+        hass, api=api, name="Starlink test", polling_interval=1, location=False)
+    api.payload = {"pop_ping_latency_ms": 30.0}
+    await coordinator.async_refresh()
+
+    calls = []
+    remove = coordinator.async_add_key_listener(
+        "pop_ping_latency_ms", lambda: calls.append(coordinator.last_update_success),
+        deadband=5)
+
+    # Within the deadband: not reported.
+    api.payload = {"pop_ping_latency_ms": 31.0}
+    await coordinator.async_refresh()
+    assert calls == []
+
+    # The dish drops out: the listener hears of it, to go unavailable.
+    api.payload = None
+    await coordinator.async_refresh()
+    assert calls == [False]
+
+    # The dish is back with a value within the deadband of the last one
+    # reported: the listener must still hear of it, to come back.
+    api.payload = {"pop_ping_latency_ms": 31.5}
+    await coordinator.async_refresh()
+    assert calls == [False, True]
+
+    # And the deadband applies again from then on.
+    api.payload = {"pop_ping_latency_ms": 32.0}
+    await coordinator.async_refresh()
+    assert calls == [False, True]
+    remove()
+
+
+async def test_adaptive_interval_jitter_survives_short_intervals(hass):
+    api = FakeApi()
+    coordinator = StarlinkUpdateCoordinator(
+        hass, api=api, name="Starlink test", polling_interval=1, max_polling_interval=4,
+        adaptive=True, location=False)
+    intervals = set()
+    # An obstructed dish keeps the interval at the 1 s minimum.
+    api.payload = {"state": "CONNECTED", "currently_obstructed": True}
+    for _ in range(20):
+        await coordinator.async_refresh()
+        intervals.add(coordinator.update_interval.total_seconds())
+    assert len(intervals) > 1
+    assert all(0.9 <= interval <= 1.1 for interval in intervals)
+
+
+async def test_history_busy_does_not_trip_breaker(hass):
+    api = FakeApi()
+    coordinator = StarlinkHistoryCoordinator(
+        hass, api=api, name="Starlink history test", polling_interval=15)
+
+    api.payload = BusyError("Previous history fetch still running")
+    await coordinator.async_refresh()
+    assert not coordinator.last_update_success
+    assert api.breaker.failures == 0
+
+    api.payload = ConnectionError("Failure getting history")
+    await coordinator.async_refresh()
+    assert api.breaker.failures == 1
@@ -0,0 +1,117 @@
+"""Check HistoryRing and HistoryAccumulator against starlink_grpc."""
+import math
+from types import SimpleNamespace
+
+import pytest
+import starlink_grpc
+
+from custom_components.starlink.ring import BULK_FIELDS, HistoryAccumulator, HistoryRing
+from tests.test_stats import assert_close
+
+BUFFER_SAMPLES = 900
+
+# Successive fetches, as (counter, boot) pairs; boot changes when the dish
+# reboots and its counter starts again from 0.
+FETCHES = {
+    "wraparound": [(50, 0), (100, 0), (400, 0), (1000, 0), (1800, 0), (2500, 0), (4000, 0)],
+    "overlapping": [(900, 0), (900, 0), (905, 0), (1500, 0), (1501, 0), (1501, 0)],
+    "reboot": [(1500, 0), (2000, 0), (30, 1), (700, 1), (1200, 1), (10, 2)],
+    "gap": [(500, 0), (2000, 0), (2100, 0)],
+    "reboot_unseen": [(100, 0), (2000, 1), (2300, 1)],
+}
+
+
+def sample(boot: int, counter: int) -> dict:
+    """Return the values a dish records for the sample at counter.
+
+    Latency is set even for samples with full ping drop, as the ring must
+    mask it out itself.
+    """
+    return {
+        "pop_ping_drop_rate": (0.0, 0.0, 0.25, 1.0)[(counter * 7 + boot) % 4],
+        "pop_ping_latency_ms": 20.0 + (counter * 37 + boot) % 400 / 10,
+        "downlink_throughput_bps": 1000.0 * counter + boot,
+        "uplink_throughput_bps": 10.0 * counter + boot,
+        "power_in": 40.0 + (counter + boot) % 40,
+    }
+
+
+def dish_history(current: int, boot: int = 0) -> SimpleNamespace:
+    """Return the history buffer a dish reports once its counter reaches current."""
+    fields = {field: [0.0] * BUFFER_SAMPLES for field in starlink_grpc.HISTORY_FIELDS}
+    for counter in range(max(0, current - BUFFER_SAMPLES), current):
+        for field, value in sample(boot, counter).items():
+            fields[field][counter % BUFFER_SAMPLES] = value
+    return SimpleNamespace(current=current, **fields)
+
+
+@pytest.mark.parametrize("capacity", (300, 1000, 3600))
+@pytest.mark.parametrize("fetches", FETCHES.values(), ids=FETCHES.keys())
+def test_ring_matches_bulk_data(fetches, capacity):
+    ring = HistoryRing(capacity)
+    expected = {field: [] for field in BULK_FIELDS}
+    end_counter = None
+    for current, boot in fetches:
+        history = dish_history(current, boot)
+        general, bulk = starlink_grpc.history_bulk_data(-1, start=end_counter, history=history)
+        end_counter = general["end_counter"]
+
+        new, lost = ring.ingest(history)
+        assert new == general["samples"]
+        if lost:
+            expected = {field: [] for field in BULK_FIELDS}
+        for field, values in expected.items():
+            values.extend(math.nan if value is None else value for value in bulk[field])
+            del values[:-capacity]
+
+        assert ring.counter == current
+        assert ring.size == len(expected["pop_ping_drop_rate"])
+        latest = ring.latest(capacity)
+        for field, values in expected.items():
+            assert_close(latest[field].tolist(), values, field)
+
+
+def test_ring_latest():
+    ring = HistoryRing(100)
+    assert all(len(view) == 0 for view in ring.latest(10).values())
+    ring.ingest(dish_history(250))
+    latest = ring.latest(1000)
+    assert len(latest["pop_ping_drop_rate"]) == 100
+    assert latest["downlink_throughput_bps"][-1] == sample(0, 249)["downlink_throughput_bps"]
+    with pytest.raises(ValueError):
+        latest["power_w"][0] = 0.0
+
+
+@pytest.mark.parametrize("max_samples", (500, 2000, 86400))
+@pytest.mark.parametrize("fetches", FETCHES.values(), ids=FETCHES.keys())
+@pytest.mark.parametrize("samples, start", ((-1, None), (10, None), (-1, 890)))
+def test_accumulator_matches_concatenate_history(fetches, max_samples, samples, start):
+    accumulated = HistoryAccumulator(max_samples)
+    expected = None
+    for current, boot in fetches:
+        history = dish_history(current, boot)
+        if expected is None:
+            # Appending a history to itself takes only the samples chosen
+            # by samples and start.
+            expected = starlink_grpc.concatenate_history(history, history, samples, start)
+        else:
+            expected = starlink_grpc.concatenate_history(expected, history)
+        accumulated.append(history, samples, start)
+
+        assert accumulated.current == expected.current
+        assert len(accumulated) == min(len(expected.pop_ping_drop_rate), max_samples)
+        for field in starlink_grpc.HISTORY_FIELDS:
+            values = getattr(expected, field)[-len(accumulated):] if len(accumulated) else []
+            assert_close(getattr(accumulated, field).tolist(), values, field)
+
+
+def test_accumulator_clear():
+    accumulated = HistoryAccumulator(500)
+    accumulated.append(dish_history(1000))
+    accumulated.clear()
+    assert accumulated.current is None
+    assert len(accumulated) == 0
+    accumulated.append(dish_history(1200, 1), 10)
+    assert accumulated.current == 1200
+    assert accumulated.downlink_throughput_bps.tolist() == [
+        sample(1, counter)["downlink_throughput_bps"] for counter in range(1190, 1200)]
@@ -0,0 +1,49 @@
+"""Tests of the PollScheduler offsets coordinators refresh at."""
+import asyncio
+from datetime import timedelta
+import logging
+
+from custom_components.starlink.scheduler import PollScheduler, ScheduledCoordinator
+
+
+class Coordinator(ScheduledCoordinator):
+    """Records the loop time of each refresh."""
+
+    def __init__(self, hass, scheduler):
+        self.scheduler = scheduler
+        self.started = []
+        super().__init__(hass, logger=logging.getLogger(__name__),
+                         name="test", update_interval=timedelta(seconds=1))
+
+    async def _async_update_data(self):
+        self.started.append(self.hass.loop.time())
+        return {}
+
+
+def test_offsets_are_spread_and_respread():
+    scheduler = PollScheduler()
+    first, second, third = object(), object(), object()
+    unregister = [scheduler.async_register(c) for c in (first, second, third)]
+    assert [scheduler.offset(c) for c in (first, second, third)] == [0, 1 / 3, 2 / 3]
+    unregister[0]()
+    assert [scheduler.offset(c) for c in (first, second, third)] == [0, 0, 0.5]
+
+
+async def test_every_refresh_starts_at_its_offset(hass):
+    scheduler = PollScheduler()
+    coordinators = [Coordinator(hass, scheduler) for _ in range(2)]
+    for coordinator in coordinators:
+        scheduler.async_register(coordinator)
+    await asyncio.gather(*(scheduler.async_first_refresh(c) for c in coordinators))
+    removers = [c.async_add_listener(lambda: None) for c in coordinators]
+    await asyncio.sleep(3.2)
+    for remove in removers:
+        remove()
+
+    for coordinator in coordinators:
+        # The first refresh and at least two scheduled ones.
+        assert len(coordinator.started) >= 3
+        offset = scheduler.offset(coordinator)
+        for started in coordinator.started:
+            assert abs((started - offset + 0.5) % 1 - 0.5) < 0.05, coordinator.started
+
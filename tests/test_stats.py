@@ -0,0 +1,95 @@
+"""Check stats.history_stats against starlink_grpc.history_stats."""
+import math
+import random
+from types import SimpleNamespace
+
+import pytest
+import starlink_grpc
+
+from custom_components.starlink.stats import history_stats
+
+BUFFER_SAMPLES = 900
+PARSE_SAMPLES = (-1, 0, 1, 10, 300, BUFFER_SAMPLES, 2 * BUFFER_SAMPLES)
+
+
+def make_history(seed: int, current: int, nan_rate: float = 0.0) -> SimpleNamespace:
+    """Return a history buffer of random samples, as get_history would.
+
+    A sample is a full ping drop with probability nan_rate, and then has a
+    latency of NaN, like on a real dish. Drops come in runs of varied length
+    so the run length stats have something to count.
+    """
+    rnd = random.Random(seed)
+    drops = []
+    while len(drops) < BUFFER_SAMPLES:
+        drop = 1.0 if rnd.random() < nan_rate else rnd.choice((0.0, 0.0, 0.0, 0.25))
+        drops += [drop] * rnd.choice((1, 2, 59, 60, 61, 120, 400))
+    drops = drops[:BUFFER_SAMPLES]
+    return SimpleNamespace(
+        current=current,
+        pop_ping_drop_rate=drops,
+        pop_ping_latency_ms=[
+            math.nan if drop == 1.0 else rnd.uniform(20, 60) for drop in drops],
+        downlink_throughput_bps=[rnd.random() * 10 ** rnd.randrange(3, 9) for _ in drops],
+        uplink_throughput_bps=[rnd.random() * 10 ** rnd.randrange(3, 7) for _ in drops],
+        power_in=[rnd.uniform(40, 80) for _ in drops],
+    )
+
+
+def assert_close(got, expected, path: str):
+    if isinstance(expected, list):
+        assert len(got) == len(expected), path
+        for index, (got_item, expected_item) in enumerate(zip(got, expected)):
+            assert_close(got_item, expected_item, f"{path}[{index}]")
+    elif expected is None or got is None:
+        assert got is expected, path
+    elif isinstance(expected, float) and math.isnan(expected):
+        assert math.isnan(got), path
+    else:
+        assert math.isclose(got, expected, rel_tol=1e-9, abs_tol=1e-9), (path, got, expected)
+
+
+def assert_same_stats(history, parse_samples: int, start=None):
+    expected = starlink_grpc.history_stats(parse_samples, start=start, history=history)
+    got = history_stats(parse_samples, start=start, history=history)
+    assert len(got) == len(expected)
+    for got_group, expected_group in zip(got, expected):
+        assert got_group.keys() == expected_group.keys()
+        for key, value in expected_group.items():
+            assert_close(got_group[key], value, key)
+
+
+@pytest.mark.parametrize("parse_samples", PARSE_SAMPLES)
+@pytest.mark.parametrize("seed", range(5))
+def test_random(seed, parse_samples):
+    assert_same_stats(make_history(seed, BUFFER_SAMPLES), parse_samples)
+
+
+@pytest.mark.parametrize("parse_samples", PARSE_SAMPLES)
+@pytest.mark.parametrize("nan_rate", (0.05, 0.5, 1.0))
+def test_nan_latency(nan_rate, parse_samples):
+    assert_same_stats(make_history(7, BUFFER_SAMPLES, nan_rate), parse_samples)
+
+
+@pytest.mark.parametrize("parse_samples", PARSE_SAMPLES)
+@pytest.mark.parametrize("current", (BUFFER_SAMPLES + 1, BUFFER_SAMPLES + 437, 10 * BUFFER_SAMPLES))
+def test_wrapped(current, parse_samples):
+    assert_same_stats(make_history(current, current, nan_rate=0.05), parse_samples)
+
+
+@pytest.mark.parametrize("parse_samples", PARSE_SAMPLES)
+@pytest.mark.parametrize("current", (0, 1, 50))
+def test_partly_filled(current, parse_samples):
+    assert_same_stats(make_history(current, current, nan_rate=0.05), parse_samples)
+
+
+@pytest.mark.parametrize("offset", (-2000, -10, -1, 0, 5))
+def test_start(offset):
+    current = BUFFER_SAMPLES + 437
+    assert_same_stats(make_history(3, current, nan_rate=0.05), -1, start=current + offset)
+
+
+def test_unwrapped():
+    first = make_history(1, 1000, nan_rate=0.05)
+    second = make_history(2, 1500, nan_rate=0.05)
+    assert_same_stats(starlink_grpc.concatenate_history(first, second), -1)
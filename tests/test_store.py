@@ -0,0 +1,99 @@
+"""Tests of BulkHistoryStore's segments, dedupe and range reads."""
+import numpy as np
+import pytest
+
+from custom_components.starlink.store import FIELDS, TIME_DRIFT, BulkHistoryStore
+
+T0 = 1_000_000
+
+
+def append(store: BulkHistoryStore, samples: int, timestamp: int, counter: int):
+    """Append samples whose every value is their counter."""
+    values = np.arange(counter, counter + samples, dtype=float)
+    store.append({field: values for field in FIELDS}, samples, timestamp, counter)
+
+
+def layout(store: BulkHistoryStore):
+    return [(segment.counter, segment.timestamp, segment.count) for segment in store.segments]
+
+
+def read_all(store: BulkHistoryStore):
+    timestamps, columns = store.read(0, 10 ** 10)
+    for field in FIELDS:
+        assert columns[field].tolist() == columns[FIELDS[0]].tolist(), field
+    return timestamps.tolist(), columns[FIELDS[0]].tolist()
+
+
+def test_segments_split_when_full(tmp_path):
+    store = BulkHistoryStore(str(tmp_path), segment_samples=100)
+    append(store, 250, T0, 1000)
+    assert layout(store) == [(1000, T0, 100), (1100, T0 + 100, 100), (1200, T0 + 200, 50)]
+    append(store, 80, T0 + 250, 1250)
+    assert layout(store) == [
+        (1000, T0, 100), (1100, T0 + 100, 100), (1200, T0 + 200, 100), (1300, T0 + 300, 30)]
+    assert read_all(store) == (list(range(T0, T0 + 330)), list(range(1000, 1330)))
+
+
+@pytest.mark.parametrize("timestamp, counter", (
+    (T0 + 60, 1070),  # counter skipped ahead
+    (T0 + 70, 1060),  # time jumped ahead
+    (T0 + 40, 5),     # dish reboot
+))
+def test_segments_split_on_discontinuity(tmp_path, timestamp, counter):
+    store = BulkHistoryStore(str(tmp_path), segment_samples=100)
+    append(store, 60, T0, 1000)
+    append(store, 10, timestamp, counter)
+    assert layout(store) == [(1000, T0, 60), (counter, timestamp, 10)]
+
+
+@pytest.mark.parametrize("drift", range(-TIME_DRIFT, TIME_DRIFT + 1))
+def test_held_samples_are_skipped(tmp_path, drift):
+    store = BulkHistoryStore(str(tmp_path), segment_samples=100)
+    append(store, 150, T0, 1000)
+    # A restart passes the whole buffer again, under a time base that may
+    # have been re-established slightly off.
+    append(store, 150, T0 + 60 + drift, 1060)
+    timestamps, values = read_all(store)
+    assert values == list(range(1000, 1210))
+    assert sum(segment.count for segment in store.segments) == 210
+
+    # Samples that are all held change nothing.
+    append(store, 20, T0 + 100, 1100)
+    assert read_all(store)[1] == values
+
+
+def test_held_needs_matching_time(tmp_path):
+    store = BulkHistoryStore(str(tmp_path), segment_samples=100)
+    append(store, 50, T0, 1000)
+    # Same counters, recorded at another time: another run of the dish.
+    append(store, 20, T0 + 5000, 1010)
+    assert layout(store) == [(1000, T0, 50), (1010, T0 + 5000, 20)]
+    append(store, 20, T0 + TIME_DRIFT + 1, 1000)
+    assert layout(store)[-1] == (1000, T0 + TIME_DRIFT + 1, 20)
+
+
+def test_read_across_sealed_segment(tmp_path):
+    store = BulkHistoryStore(str(tmp_path), segment_samples=100)
+    append(store, 150, T0, 1000)
+    append(store, 30, T0 + 200, 7)
+    assert list(store._maps) == [store.segments[-1].name]
+
+    timestamps, columns = store.read(T0 + 90, T0 + 210)
+    assert timestamps.tolist() == list(range(T0 + 90, T0 + 150)) + list(range(T0 + 200, T0 + 210))
+    assert columns["power_w"].tolist() == list(range(1090, 1150)) + list(range(7, 17))
+    # The sealed segments were mapped only for the read.
+    assert list(store._maps) == [store.segments[-1].name]
+
+    timestamps, columns = store.read(T0 + 150, T0 + 200)
+    assert timestamps.size == 0
+    assert all(column.size == 0 for column in columns.values())
+
+
+def test_reopen(tmp_path):
+    store = BulkHistoryStore(str(tmp_path), segment_samples=100)
+    append(store, 150, T0, 1000)
+    reopened = BulkHistoryStore(str(tmp_path), segment_samples=100)
+    assert read_all(reopened) == read_all(store)
+    # The restart's overlap with what is on disk is not stored again.
+    append(reopened, 100, T0 + 100, 1100)
+    assert read_all(reopened) == (list(range(T0, T0 + 200)), list(range(1000, 1200)))
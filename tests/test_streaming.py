@@ -0,0 +1,89 @@
+"""Check the streaming estimators against numpy over the same samples."""
+import math
+import random
+
+import numpy as np
+import pytest
+
+from custom_components.starlink.streaming import (
+    STREAM_QUANTILES,
+    Ewma,
+    StreamingStats,
+    WindowedQuantiles,
+    stream_key,
+)
+
+
+def latency_series(seed: int, count: int) -> list:
+    """Return ping latencies, with an occasional spike, as a dish reports them."""
+    rnd = random.Random(seed)
+    return [rnd.lognormvariate(3.4, 0.3) * (5 if rnd.random() < 0.02 else 1)
+            for _ in range(count)]
+
+
+@pytest.mark.parametrize("window", (60, 300, 900))
+@pytest.mark.parametrize("seed", range(3))
+def test_quantiles_match_numpy_over_window(seed, window):
+    quantiles = WindowedQuantiles(window)
+    values = latency_series(seed, 2 * window + 17)
+    for now, value in enumerate(values):
+        quantiles.add(value, float(now))
+        # Only the values from the last window seconds count.
+        held = values[max(0, now - window + 1):now + 1]
+        if now % 37 == 0 or now == len(values) - 1:
+            assert len(quantiles) == len(held)
+            for quantile in STREAM_QUANTILES:
+                assert math.isclose(quantiles.value(quantile), np.quantile(held, quantile))
+
+
+def test_quantiles_are_ordered():
+    quantiles = WindowedQuantiles(60)
+    for now, value in enumerate(latency_series(7, 600)):
+        quantiles.add(value, float(now))
+        estimates = [quantiles.value(quantile) for quantile in sorted(STREAM_QUANTILES)]
+        assert estimates == sorted(estimates)
+
+
+def test_quantiles_expire_without_new_values():
+    quantiles = WindowedQuantiles(60)
+    assert quantiles.value(0.5) is None
+    quantiles.add(10.0, 0.0)
+    quantiles.add(20.0, 30.0)
+    quantiles.add(None, 59.0)
+    assert quantiles.value(0.5) == 15.0
+    quantiles.add(None, 60.0)
+    assert quantiles.value(0.5) == 20.0
+    quantiles.add(None, 90.0)
+    assert quantiles.value(0.5) is None
+
+
+def test_quantiles_max_samples():
+    quantiles = WindowedQuantiles(60, max_samples=3)
+    for now, value in enumerate((1.0, 2.0, 3.0, 4.0)):
+        quantiles.add(value, now / 10)
+    assert len(quantiles) == 3
+    assert quantiles.value(0) == 2.0
+
+
+def test_ewma_decays_with_time():
+    ewma = Ewma(60)
+    ewma.add(0.0, 0.0)
+    ewma.add(1.0, 60.0)
+    assert math.isclose(ewma.value, 1 - math.exp(-1))
+    # The same elapsed time in two steps gives the same average.
+    split = Ewma(60)
+    split.add(0.0, 0.0)
+    split.add(1.0, 30.0)
+    split.add(1.0, 60.0)
+    assert math.isclose(split.value, ewma.value)
+
+
+def test_streaming_stats_skip_missing_values():
+    stats = StreamingStats(fields=("pop_ping_latency_ms",), windows=(60,))
+    values = stats.update({"pop_ping_latency_ms": 30.0}, 0.0)
+    values = stats.update({"pop_ping_latency_ms": math.nan}, 1.0)
+    values = stats.update({}, 2.0)
+    assert values[stream_key("pop_ping_latency_ms", 60, "p50")] == 30.0
+    assert values[stream_key("pop_ping_latency_ms", 60, "ewma")] == 30.0
+    values = stats.update({"pop_ping_latency_ms": None}, 61.0)
+    assert values[stream_key("pop_ping_latency_ms", 60, "p99")] is None